@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: GPL-2.0-only
+"""Compare the codecs `elogviewer.elog` reads on generated elogs.
+
+Run with `uv run python benchmarks/bench_codecs.py`.  The table lists,
+for each codec, the on-disk size of the elogs and how fast elogviewer
+reads them back.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from elogviewer.elog import OPENERS, _open  # pyright: ignore[reportPrivateUsage]
+
+_PACKAGES = (
+    "dev-lang/python",
+    "sys-kernel/gentoo-kernel",
+    "app-editors/vim",
+    "x11-drivers/nvidia-drivers",
+    "sys-apps/systemd",
+    "media-libs/mesa",
+)
+_PARAGRAPHS = (
+    (
+        "If you have just upgraded from an older version, you need to update\n"
+        "your configuration files in /etc with dispatch-conf or etc-update."
+    ),
+    (
+        "The following kernel modules were built and installed. You may have\n"
+        "to reboot or to reload them with modprobe before they are used."
+    ),
+    (
+        "Please read https://wiki.gentoo.org/wiki/Project:Python for the\n"
+        "upgrade guide, see also bug #123456 for the known issues."
+    ),
+    (
+        "QA Notice: Files built without respecting CFLAGS have been detected\n"
+        " Please include the following list of files in your report:\n"
+        " /usr/lib64/libfoo.so.1.2.3"
+    ),
+    (
+        "Some optional features are disabled. Install the following packages\n"
+        "to enable them: dev-libs/libxml2-2.12 media-libs/libpng-1.6"
+    ),
+)
+
+
+def randomElog(rng: random.Random) -> str:
+    package = rng.choice(_PACKAGES)
+    lines = [
+        f" * Messages for package {package}-{rng.randint(1, 9)}.{rng.randint(0, 99)}:"
+    ]
+    for eclass in rng.sample(("INFO", "WARN", "ERROR", "LOG", "QA"), rng.randint(1, 3)):
+        lines.append(f"{eclass}: {rng.choice(('setup', 'postinst', 'install'))}")
+        lines.extend(rng.choices(_PARAGRAPHS, k=rng.randint(1, 6)))
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000, help="elogs per codec")
+    parser.add_argument("--repeat", type=int, default=3, help="keep the best of")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [randomElog(rng) for _ in range(args.count)]
+    rawSize = sum(len(text.encode()) for text in texts)
+
+    print(f"{args.count} elogs, {rawSize / args.count:.0f} bytes on average\n")
+    print("| codec | size on disk | ratio | read (MB/s) | read (elogs/s) |")
+    print("|-------|-------------:|------:|------------:|---------------:|")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for ext, opener in OPENERS.items():
+            directory = Path(tmpdir) / ext.lstrip(".")
+            directory.mkdir()
+            suffix = ".log" if ext == ".log" else f".log{ext}"
+            filenames = [
+                directory / f"cat:pkg-1.0:20200101-{n:06d}{suffix}"
+                for n in range(args.count)
+            ]
+            for filename, text in zip(filenames, texts, strict=True):
+                with opener(filename, "wb") as f:
+                    f.write(text.encode())
+            diskSize = sum(filename.stat().st_size for filename in filenames)
+
+            elapsed = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                for filename in filenames:
+                    with _open(filename) as f:
+                        f.read()
+                elapsed = min(elapsed, time.perf_counter() - start)
+
+            print(
+                f"| {ext.lstrip('.')} | {diskSize / 1024:.0f} KiB"
+                f" | {rawSize / diskSize:.2f}"
+                f" | {rawSize / elapsed / 1e6:.1f}"
+                f" | {args.count / elapsed:.0f} |"
+            )
+
+
+if __name__ == "__main__":
+    main()
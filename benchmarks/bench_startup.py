@@ -0,0 +1,84 @@
+# SPDX-License-Identifier: GPL-2.0-only
+"""Measure how long elogviewer takes to start.
+
+Run with `uv run python benchmarks/bench_startup.py`.  Every step runs
+in a fresh interpreter and the table lists the best wall-clock time of
+each.  The script fails when the window takes longer than the budget
+to show up.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Show the window on an empty elog directory and quit once it painted.
+_SHOW_WINDOW = """
+import sys
+from pathlib import Path
+
+from PyQt6 import QtCore, QtWidgets
+
+from elogviewer.__main__ import _Args
+from elogviewer.uiview import Elogviewer
+
+app = QtWidgets.QApplication(sys.argv)
+window = Elogviewer(_Args(sources={Path(sys.argv[1]): ""}))
+window.show()
+QtCore.QTimer.singleShot(0, app.quit)
+app.exec()
+"""
+
+_STEPS = (
+    ("python", ["-c", "pass"]),
+    ("import elogviewer", ["-c", "import elogviewer.__main__"]),
+    ("argument parsing", ["-m", "elogviewer", "--help"]),
+    ("first paint", ["-c", _SHOW_WINDOW]),
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5, help="keep the best of")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=500,
+        help="maximum time to first paint in milliseconds",
+    )
+    args = parser.parse_args()
+
+    env = os.environ | {
+        "QT_QPA_PLATFORM": os.environ.get("QT_QPA_PLATFORM", "offscreen")
+    }
+    timings: dict[str, float] = {}
+    print("| step | time (ms) |")
+    print("|------|----------:|")
+    with tempfile.TemporaryDirectory() as elogpath:
+        for name, command in _STEPS:
+            elapsed = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                subprocess.run(
+                    [sys.executable, *command, elogpath],
+                    check=True,
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                elapsed = min(elapsed, time.perf_counter() - start)
+            timings[name] = elapsed * 1000
+            print(f"| {name} | {timings[name]:.0f} |")
+
+    firstPaint = timings["first paint"]
+    print(f"\nfirst paint in {firstPaint:.0f} ms, budget {args.budget:.0f} ms")
+    if firstPaint > args.budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
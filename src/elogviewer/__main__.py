@@ -1,19 +1,23 @@
 # SPDX-License-Identifier: GPL-2.0-only
 
+from __future__ import annotations
+
 import argparse
 import dataclasses
 import logging
+import re
 import sys
+from collections.abc import Sequence
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from PyQt6 import QtGui, QtWidgets
+from elogviewer.makeconf import elogpathFromMakeConf
 
-from elogviewer.uiview import Elogviewer
+if TYPE_CHECKING:
+    from PyQt6 import QtWidgets
 
-try:
-    import portage  # type: ignore[import-not-found]
-except ImportError:
-    portage = None  # type: ignore
+    from elogviewer.elog import Elog
+    from elogviewer.uiview import Elogviewer
 
 
 _LOGGER = logging.getLogger("elogviewer")
@@ -21,7 +25,106 @@ _LOGGER = logging.getLogger("elogviewer")
 
 @dataclasses.dataclass
 class _Args:
-    elogpath: Path
+    sources: dict[Path, str]
+
+
+def _parseSources(values: list[str]) -> dict[Path, str]:
+    sources: dict[Path, str] = {}
+    for value in values:
+        name, sep, path = value.partition("=")
+        if not sep:
+            name, path = "", value
+        sources[Path(path)] = name
+    if len(sources) > 1:
+        # Tell the unnamed directories apart.
+        sources = {path: name or str(path) for path, name in sources.items()}
+    return sources
+
+
+def _defaultElogpath() -> Path:
+    # Importing portage takes a while, only do it when needed.
+    try:
+        import portage  # type: ignore[import-not-found]
+    except ImportError:
+        return elogpathFromMakeConf()
+    logdir = portage.settings["PORT_LOGDIR"]
+    if not logdir:
+        logdir = Path(portage.settings["EPREFIX"] or "/") / "var" / "log" / "portage"
+    return Path(logdir) / "elog"
+
+
+def _setUpIconTheme(app: QtWidgets.QApplication, elogviewer: Elogviewer) -> None:
+    from PyQt6 import QtGui
+
+    fsPaths = [Path(p) for p in QtGui.QIcon.themeSearchPaths() if not p.startswith(":")]
+    fallback = next(
+        (
+            theme
+            for theme in ("breeze", "Adwaita", "gnome")
+            if any((p / theme / "index.theme").exists() for p in fsPaths)
+        ),
+        None,
+    )
+    if fallback:
+        QtGui.QIcon.setFallbackThemeName(fallback)
+    app.setWindowIcon(QtGui.QIcon.fromTheme("applications-system"))
+    elogviewer.reloadIcons()
+
+
+def _compressOld(sources: dict[Path, str], *, olderThanDays: float, ext: str) -> int:
+    from elogviewer.archive import compressOld
+    from elogviewer.elog import scanSources
+    from elogviewer.journal import JournalStateStore
+    from elogviewer.uicontroller import journalFilename
+
+    renamed, errors = compressOld(
+        scanSources(sources), ext, olderThanDays=olderThanDays
+    )
+    store = JournalStateStore(journalFilename())
+    store.rename(renamed)
+    store.flush()
+    for filename, strerror in errors:
+        _LOGGER.error("%s: %s", filename, strerror)
+    _LOGGER.info("compressed %i elogs", len(renamed))
+    return 1 if errors else 0
+
+
+def _loadElogs(sources: dict[Path, str]) -> Sequence[Elog]:
+    from elogviewer.elog import loadElogs, openArchives, scanSources
+    from elogviewer.indexer import connectIndexer, indexerSocketFilename
+
+    indexer = connectIndexer(indexerSocketFilename(), sources)
+    if indexer is not None:
+        try:
+            elogs = indexer.query().elogs
+        except (OSError, ValueError) as exc:
+            _LOGGER.warning("indexer unavailable, scanning: %s", exc)
+        else:
+            # The members of the archives are read through their index.
+            openArchives(sources)
+            return elogs
+    return loadElogs(scanSources(sources), sources)
+
+
+def _export(sources: dict[Path, str], filename: str, *, fmt: str, pattern: str) -> int:
+    from elogviewer.export import exportElogs
+
+    regex = re.compile(pattern)
+    elogs = sorted(
+        (
+            elog
+            for elog in _loadElogs(sources)
+            if regex.search(f"{elog.category}/{elog.package}")
+        ),
+        key=lambda elog: elog.date,
+    )
+    if filename == "-":
+        exportElogs(elogs, sys.stdout, fmt=fmt)
+    else:
+        with open(filename, "w", encoding="utf-8") as f:
+            exportElogs(elogs, f, fmt=fmt)
+    _LOGGER.info("exported %i elogs", len(elogs))
+    return 0
 
 
 def main() -> None:
@@ -29,8 +132,59 @@ def main() -> None:
     parser.add_argument(
         "-p",
         "--elogpath",
-        help="path to the elog directory",
+        metavar="[NAME=]PATH",
+        action="append",
+        default=[],
+        help=(
+            "path to the elog directory, repeat to merge several directories"
+            " labelled with NAME"
+        ),
+    )
+    parser.add_argument(
+        "--compress-old",
+        metavar="DAYS",
+        type=float,
+        help="compress the plain elogs older than DAYS days and exit",
+    )
+    parser.add_argument(
+        "--compress-format",
+        metavar="FORMAT",
+        default="xz",
+        help="format of the compressed elogs: gz, bz2, xz, zst or lz4",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="FILE",
+        help="write the elogs to FILE, or to the standard output with -, and exit",
+    )
+    parser.add_argument(
+        "--export-format",
+        choices=["html", "jsonl"],
+        default="html",
+        help="format of the exported elogs",
+    )
+    parser.add_argument(
+        "--filter",
+        metavar="REGEX",
         default="",
+        help="only export the elogs whose CATEGORY/PACKAGE matches REGEX",
+    )
+    parser.add_argument(
+        "--tray",
+        action="store_true",
+        help="notify the new errors and warnings from the system tray",
+    )
+    parser.add_argument(
+        "--indexer",
+        action="store_true",
+        help="serve an index of the elog directories to the windows until interrupted",
+    )
+    parser.add_argument(
+        "--scan-rate",
+        metavar="BYTES",
+        type=float,
+        default=0,
+        help="with --indexer, read at most BYTES bytes per second of elogs",
     )
     parser.add_argument(
         "--log",
@@ -45,39 +199,87 @@ def main() -> None:
     _LOGGER.setLevel(getattr(logging, args.log))
 
     _LOGGER.debug("running on python %s", sys.version)
-    if portage and not args.elogpath:
-        logdir = portage.settings["PORT_LOGDIR"]
-        if not logdir:
-            logdir = (
-                Path(portage.settings["EPREFIX"] or "/") / "var" / "log" / "portage"
-            )
-        config = _Args(elogpath=Path(logdir) / "elog")
+    if args.elogpath:
+        config = _Args(sources=_parseSources(args.elogpath))
     else:
-        config = _Args(elogpath=Path(args.elogpath))
+        config = _Args(sources={_defaultElogpath(): ""})
+
+    _LOGGER.debug("sources are set to %r", config.sources)
 
-    _LOGGER.debug("elogpath is set to %r", config.elogpath)
+    if args.compress_old is not None:
+        from elogviewer.elog import OPENERS
+
+        # zst and lz4 depend on the python version and optional modules.
+        if args.compress_format == "log" or f".{args.compress_format}" not in OPENERS:
+            parser.error(f"unavailable compress format: {args.compress_format}")
+        sys.exit(
+            _compressOld(
+                config.sources,
+                olderThanDays=args.compress_old,
+                ext=f".{args.compress_format}",
+            )
+        )
+
+    if args.export is not None:
+        sys.exit(
+            _export(
+                config.sources,
+                args.export,
+                fmt=args.export_format,
+                pattern=args.filter,
+            )
+        )
+
+    if args.indexer:
+        from elogviewer.indexer import indexerSocketFilename, serve
+
+        try:
+            serve(
+                indexerSocketFilename(), config.sources, bytesPerSecond=args.scan_rate
+            )
+        except OSError as exc:
+            _LOGGER.error("%s", exc)
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.tray:
+        sys.exit(_runTray(config))
+
+    sys.exit(_runGui(config))
+
+
+def _runGui(config: _Args) -> int:
+    # Qt widgets take a while to import, keep them out of the command line.
+    from PyQt6 import QtCore, QtWidgets
+
+    from elogviewer.indexer import connectIndexer, indexerSocketFilename
+    from elogviewer.uiview import Elogviewer
 
     app = QtWidgets.QApplication(sys.argv)
-    _fsPaths = [
-        Path(p) for p in QtGui.QIcon.themeSearchPaths() if not p.startswith(":")
-    ]
-    _fallback = next(
-        (
-            theme
-            for theme in ("breeze", "Adwaita", "gnome")
-            if any((p / theme / "index.theme").exists() for p in _fsPaths)
-        ),
-        None,
+    elogviewer = Elogviewer(
+        config, indexer=connectIndexer(indexerSocketFilename(), config.sources)
     )
-    if _fallback:
-        QtGui.QIcon.setFallbackThemeName(_fallback)
-    app.setWindowIcon(QtGui.QIcon.fromTheme("applications-system"))
-
-    elogviewer = Elogviewer(config)
     elogviewer.show()
+    # Probing the icon themes on disk can wait until the window shows.
+    QtCore.QTimer.singleShot(0, lambda: _setUpIconTheme(app, elogviewer))
     elogviewer.start()
+    return app.exec()
 
-    sys.exit(app.exec())
+
+def _runTray(config: _Args) -> int:
+    from PyQt6 import QtWidgets
+
+    from elogviewer.uitray import TrayNotifier
+
+    app = QtWidgets.QApplication(sys.argv)
+    if not QtWidgets.QSystemTrayIcon.isSystemTrayAvailable():
+        _LOGGER.error("no system tray available")
+        return 1
+    # Closing the window leaves the notifier running.
+    app.setQuitOnLastWindowClosed(False)
+    notifier = TrayNotifier(config)
+    notifier.start()
+    return app.exec()
 
 
 if __name__ == "__main__":
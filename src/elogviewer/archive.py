@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import time
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Final
+
+from .elog import OPENERS, isArchiveMember
+from .throttle import Throttle
+
+_LOGGER = logging.getLogger("elogviewer")
+
+_DAY: Final = 24 * 60 * 60
+# Never touch an elog written less than that many seconds ago: emerge may
+# still be writing to it.
+_MIN_IDLE_SECONDS: Final = 10 * 60
+_CHUNK_SIZE: Final = 1 << 16
+
+
+def compress(filename: Path, ext: str) -> Path | None:
+    """Compress the plain elog `filename` to `filename` + `ext`.
+
+    Return the new filename or None if the elog changed meanwhile.
+    """
+    target = filename.with_name(filename.name + ext)
+    tmpFilename = filename.with_name(f".{target.name}.tmp")
+    before = filename.stat()
+    try:
+        with filename.open("rb") as src, OPENERS[ext](tmpFilename, "wb") as dst:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        shutil.copystat(filename, tmpFilename)
+        after = filename.stat()
+        if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+            _LOGGER.warning("%s: changed while compressing, skipping", filename)
+            tmpFilename.unlink()
+            return None
+        os.replace(tmpFilename, target)
+    except BaseException:
+        tmpFilename.unlink(missing_ok=True)
+        raise
+    filename.unlink()
+    return target
+
+
+def isArchivable(filename: Path, *, olderThanDays: float, now: float) -> bool:
+    if filename.suffix != ".log" or isArchiveMember(filename):
+        return False
+    mtime = filename.stat().st_mtime
+    return mtime < now - max(olderThanDays * _DAY, _MIN_IDLE_SECONDS)
+
+
+def compressOld(
+    filenames: Iterable[Path],
+    ext: str,
+    *,
+    olderThanDays: float,
+    now: float | None = None,
+    throttle: Throttle | None = None,
+) -> tuple[dict[Path, Path], Sequence[tuple[Path, str]]]:
+    """Compress the plain elogs last modified more than `olderThanDays` ago.
+
+    Return the new filenames by their former name and the errors.  Pass
+    a `throttle` to slow the reads down in the background.
+    """
+    if now is None:
+        now = time.time()
+    renamed: dict[Path, Path] = {}
+    errors: list[tuple[Path, str]] = []
+    for filename in filenames:
+        try:
+            if not isArchivable(filename, olderThanDays=olderThanDays, now=now):
+                continue
+            if throttle is not None:
+                throttle.consume(filename.stat().st_size)
+            target = compress(filename, ext)
+        except OSError as exc:
+            errors.append((filename, exc.strerror or str(exc)))
+        else:
+            if target is not None:
+                renamed[filename] = target
+    return renamed, errors
@@ -9,3 +9,13 @@ class EClass(str, enum.Enum):
     Log = "LOG"
     Info = "INFO"
     QA = "QA"
+
+
+def eclassColor(eclass: EClass) -> tuple[int, int, int]:
+    return {
+        EClass.Error: (0xFF, 0x00, 0x00),
+        EClass.Warning: (0xE5, 0x67, 0x17),
+        EClass.Log: (0x00, 0x80, 0x00),
+        EClass.Info: (0x00, 0x80, 0x00),
+        EClass.QA: (0x00, 0x80, 0x00),
+    }[eclass]
@@ -3,27 +3,223 @@
 from __future__ import annotations
 
 import bz2
+import datetime
+import glob
 import gzip
+import hashlib
+import importlib
 import io
+import itertools
 import logging
+import lzma
+import mmap
+import os
 import re
+import tarfile
 import time
+from collections.abc import Buffer, Callable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import AbstractContextManager, closing
 from dataclasses import dataclass
 from pathlib import Path
-from typing import IO, final
+from types import ModuleType
+from typing import IO, Final, cast, final
 
 from .eclass import EClass
+from .tarindex import TarIndex, TarMember, isTarArchive
+from .throttle import Throttle
 
 _LOGGER = logging.getLogger("elogviewer")
 
 
+def _importFirst(*names: str) -> ModuleType | None:
+    """Import the first of the modules `names` that is installed."""
+    for name in names:
+        try:
+            return importlib.import_module(name)
+        except ImportError:
+            continue
+    return None
+
+
+def _openLog(filename: str | Path, mode: str = "rb") -> IO[bytes]:
+    # Look `open` up on every call, pyfakefs patches it in the tests.
+    return open(filename, mode)
+
+
+zstd = _importFirst("compression.zstd", "zstandard")
+lz4 = _importFirst("lz4.frame")
+
+# Openers by file extension, they take a filename and a binary mode.
+OPENERS: Final = cast(
+    dict[str, Callable[..., IO[bytes]]],
+    {
+        ".gz": gzip.open,
+        ".bz2": bz2.open,
+        ".xz": lzma.open,
+        ".log": _openLog,
+    },
+)
+if zstd is not None:
+    OPENERS[".zst"] = zstd.open
+if lz4 is not None:
+    OPENERS[".lz4"] = lz4.open
+
+# The tar archives found so far, by filename.
+_ARCHIVES: Final[dict[Path, TarIndex]] = {}
+
+
+def _decompressMember(name: str, data: bytes) -> bytes:
+    # Members compressed by PORTAGE_ELOG_COMPRESS are stored as is.
+    ext = Path(name).suffix
+    if ext == ".log":
+        return data
+    with OPENERS[ext](io.BytesIO(data), "rb") as f:
+        return f.read()
+
+
+def _decodeMember(name: str, data: bytes) -> str:
+    return _decompressMember(name, data).decode(errors="replace")
+
+
+def _archiveMember(filename: Path) -> tuple[TarIndex, TarMember] | None:
+    if not _ARCHIVES:
+        return None
+    for parent in filename.parents:
+        index = _ARCHIVES.get(parent)
+        if index is not None:
+            member = index.member(filename.relative_to(parent).as_posix())
+            return None if member is None else (index, member)
+    return None
+
+
+def isArchiveMember(filename: Path) -> bool:
+    return _archiveMember(filename) is not None
+
+
+def archiveOf(filename: Path) -> Path | None:
+    """The tar archive holding `filename`, if its index is loaded."""
+    return next((parent for parent in filename.parents if parent in _ARCHIVES), None)
+
+
+def digestOf(data: Buffer) -> str:
+    """Hash the contents of an elog to find the identical ones."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _scanMember(name: str, data: bytes) -> tuple[EClass, str]:
+    try:
+        data = _decompressMember(name, data)
+    except KeyError:
+        _LOGGER.error("%s: unsupported format", name)
+        return EClass.Error, ""
+    except Exception:
+        # As in `Elog._scan()`, a corrupted member must not end the index.
+        _LOGGER.exception("%s: could not scan", name)
+        return EClass.Error, ""
+    return Elog.getClass(data), digestOf(data)
+
+
+def findElogs(elogpath: Path) -> list[Path]:
+    if isTarArchive(elogpath):
+        try:
+            index = TarIndex.load(elogpath, scan=_scanMember)
+        except (OSError, tarfile.TarError) as exc:
+            _LOGGER.warning("%s: could not index the archive: %s", elogpath, exc)
+            _ARCHIVES.pop(elogpath, None)
+            return []
+        _ARCHIVES[elogpath] = index
+        return [elogpath / member.name for member in index.members()]
+    return [
+        Path(f)
+        for f in itertools.chain(
+            glob.iglob(str(elogpath / "*:*:*.log*")),
+            glob.iglob(str(elogpath / "*" / "*:*.log*")),
+        )
+    ]
+
+
+def openArchives(sources: Iterable[Path]) -> None:
+    """Load the index of the archives in `sources` to read their members.
+
+    `findElogs()` loads them while scanning; call this to read the members
+    of elogs known without a scan.
+    """
+    for path in sources:
+        if path in _ARCHIVES or not isTarArchive(path):
+            continue
+        try:
+            _ARCHIVES[path] = TarIndex.load(path, scan=_scanMember)
+        except (OSError, tarfile.TarError) as exc:
+            _LOGGER.warning("%s: could not index the archive: %s", path, exc)
+
+
+def sourceOf(filename: Path, sources: Mapping[Path, str]) -> str:
+    """The name of the elog directory in `sources` holding `filename`."""
+    for parent in filename.parents:
+        source = sources.get(parent)
+        if source is not None:
+            return source
+    return ""
+
+
+def scanSources(sources: Mapping[Path, str]) -> list[Path]:
+    """Find the elogs in every directory of `sources`, one thread each."""
+    with ThreadPoolExecutor(max_workers=max(1, len(sources))) as executor:
+        return list(itertools.chain.from_iterable(executor.map(findElogs, sources)))
+
+
+def loadElogs(
+    filenames: Iterable[Path],
+    sources: Mapping[Path, str],
+    *,
+    throttle: Throttle | None = None,
+) -> list[Elog]:
+    """Read the elogs in `filenames`, one thread per source.
+
+    Pass a `throttle` to slow the reads down in the background.
+    """
+    bySource: dict[str, list[Path]] = {}
+    for filename in filenames:
+        bySource.setdefault(sourceOf(filename, sources), []).append(filename)
+
+    def load(source: str, filenames: list[Path]) -> list[Elog]:
+        elogs: list[Elog] = []
+        for filename in filenames:
+            try:
+                elogs.append(Elog.fromFilename(filename, source=source))
+            except ValueError:
+                _LOGGER.error("%s: not an elog name", filename)
+            if throttle is not None:
+                throttle.consume(_size(filename))
+        return elogs
+
+    with ThreadPoolExecutor(max_workers=max(1, len(bySource))) as executor:
+        return list(
+            itertools.chain.from_iterable(
+                executor.map(load, bySource.keys(), bySource.values())
+            )
+        )
+
+
+def _size(filename: Path) -> int:
+    try:
+        return filename.stat().st_size
+    except OSError:
+        # Archive members are read with their index.
+        return 0
+
+
 def _open(filename: Path) -> AbstractContextManager[IO[str]]:
     ext = filename.suffix
+    archiveMember = _archiveMember(filename)
     try:
-        return {".gz": gzip.open, ".bz2": bz2.open, ".log": open}[ext](
-            filename,
-            "rt",
+        if archiveMember is not None:
+            index, member = archiveMember
+            return closing(io.StringIO(_decodeMember(member.name, index.read(member))))
+        # Decode at display time only, and never fail on a bad byte.
+        return io.TextIOWrapper(
+            OPENERS[ext](filename, "rb"), encoding="utf-8", errors="replace"
         )
     except KeyError:
         _LOGGER.error("%s: unsupported format", filename)
@@ -68,11 +264,17 @@ class Elog:
     package: str
     date: time.struct_time
     eclass: EClass
-    contents: str
+    # None for the elogs read from disk, see `read()`.
+    contents: str | None
+    # The name of the elog directory, empty with a single directory.
+    source: str = ""
+    # Hash of the contents to tell identical elogs apart, see `digestOf()`.
+    digest: str = ""
 
     HeaderPattern = re.compile(
         r"({}):\s+(\S+)".format("|".join(_.value for _ in EClass)),
     )
+    HeaderBytesPattern = re.compile(HeaderPattern.pattern.encode())
     AnsiColorPattern = re.compile(r"\x1b\[[0-9;]+m")
     LinkPattern = re.compile(r"((https?|ftp)://\S+)", re.IGNORECASE)
     BugPattern = re.compile(r"([bB]ug)\s+#([0-9]+)", re.IGNORECASE)
@@ -81,23 +283,103 @@ class Elog:
         re.IGNORECASE,
     )
 
+    @staticmethod
+    def dateKey(filename: Path) -> str:
+        """Sort key to order the elogs by date without opening them."""
+        # Elog filenames end with ":%Y%m%d-%H%M%S.log[.ext]".
+        return filename.name.rpartition(":")[2]
+
     @classmethod
-    def fromFilename(cls, filename: Path) -> Elog:
-        _LOGGER.debug(filename)
+    def parseFilename(cls, filename: Path) -> tuple[str, str, time.struct_time]:
+        """Return the category, the package and the date in `filename`.
+
+        Raise ValueError if `filename` is not the name of an elog.
+        """
+        return cls.parseName(filename.name, filename.parent.name)
+
+    @staticmethod
+    def parseName(name: str, parentName: str) -> tuple[str, str, time.struct_time]:
         try:
-            category, package, rest = filename.name.split(":")
+            category, package, rest = name.split(":")
         except ValueError:
-            category = filename.parent.name
-            package, rest = filename.name.split(":")
-        date = time.strptime(rest.split(".")[0], "%Y%m%d-%H%M%S")
-        with _open(filename) as f:
-            contents = f.read()
-        return cls(filename, category, package, date, cls.getClass(contents), contents)
+            category = parentName
+            package, rest = name.split(":")
+        # Faster than `strptime(date, "%Y%m%d-%H%M%S")`.
+        date = rest.split(".")[0]
+        if len(date) != 15 or date[8] != "-":
+            raise ValueError(f"{name}: no date in the name")
+        return (
+            category,
+            package,
+            datetime.datetime(
+                int(date[0:4]),
+                int(date[4:6]),
+                int(date[6:8]),
+                int(date[9:11]),
+                int(date[11:13]),
+                int(date[13:15]),
+            ).timetuple(),
+        )
+
+    @classmethod
+    def fromFilename(cls, filename: Path, *, source: str = "") -> Elog:
+        _LOGGER.debug(filename)
+        category, package, date = cls.parseFilename(filename)
+        archiveMember = _archiveMember(filename)
+        if archiveMember is not None:
+            # The index knows the eclass: leave the member compressed.
+            eclass = archiveMember[1].eclass
+            digest = archiveMember[1].digest
+        else:
+            eclass, digest = cls._scan(filename)
+        # The contents are decoded when displayed, see `read()`.
+        return cls(filename, category, package, date, eclass, None, source, digest)
+
+    def read(self) -> str:
+        if self.contents is not None:
+            return self.contents
+        with _open(self.filename) as f:
+            return f.read()
+
+    @classmethod
+    def _scan(cls, filename: Path) -> tuple[EClass, str]:
+        try:
+            if filename.suffix == ".log":
+                return cls._mapScan(filename)
+            with OPENERS[filename.suffix](filename, "rb") as f:
+                data = f.read()
+            return cls.getClass(data), digestOf(data)
+        except KeyError:
+            _LOGGER.error("%s: unsupported format", filename)
+        except Exception:
+            # The codecs raise their own errors on corrupted data, which
+            # must not end the scan of the other elogs.
+            _LOGGER.exception("%s: could not scan", filename)
+        return EClass.Error, ""
+
+    @classmethod
+    def _mapScan(cls, filename: Path) -> tuple[EClass, str]:
+        with filename.open("rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        return cls.getClass(data), digestOf(data)
+                except OSError:
+                    # Some filesystems cannot map their files, read them.
+                    pass
+            # Empty files cannot be mapped.
+            data = f.read()
+        return cls.getClass(data), digestOf(data)
 
     @classmethod
-    def getClass(cls, elogBody: str) -> EClass:
+    def getClass(cls, elogBody: str | Buffer) -> EClass:
         # Get the highest elog class. Adapted from Luca Marturana's elogv.
-        eClasses = frozenset(_[0] for _ in cls.HeaderPattern.findall(elogBody))
+        if isinstance(elogBody, str):
+            eClasses = frozenset(_[0] for _ in cls.HeaderPattern.findall(elogBody))
+        else:
+            eClasses = frozenset(
+                _[0].decode() for _ in cls.HeaderBytesPattern.findall(elogBody)
+            )
         for eClass in EClass:
             if eClass.value in eClasses:
                 return eClass
@@ -0,0 +1,139 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import html
+import io
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import Callable, Collection, Iterable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import IO, Final
+
+from .eclass import eclassColor
+from .elog import Elog, archiveOf, openArchives
+from .parser import makeHtml
+
+_LOGGER = logging.getLogger("elogviewer")
+
+# Elogs rendered per task, enough to amortize sending them to a worker.
+_CHUNK_SIZE: Final = 32
+# Chunks rendered ahead of the writer, per worker, to bound the memory.
+_CHUNKS_AHEAD: Final = 4
+
+_HTML_HEAD: Final = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Elogs</title>
+<style>section { border-top: 1px solid #ccc; }</style>
+</head>
+<body>
+"""
+_HTML_TAIL: Final = "</body>\n</html>\n"
+
+
+def _read(elog: Elog) -> str | None:
+    try:
+        return elog.read()
+    except OSError as exc:
+        _LOGGER.error("%s: %s", elog.filename, exc.strerror or exc)
+        return None
+    except Exception:
+        # The codecs raise their own errors on corrupted data, which must
+        # not end the export of the other elogs.
+        _LOGGER.exception("%s: could not read", elog.filename)
+        return None
+
+
+def _renderHtml(elogs: Sequence[Elog]) -> str:
+    sections: list[str] = []
+    for elog in elogs:
+        text = _read(elog)
+        if text is None:
+            continue
+        title = html.escape(f"{elog.category}/{elog.package}")
+        date = time.strftime("%Y-%m-%d %H:%M:%S", elog.date)
+        source = f" ({html.escape(elog.source)})" if elog.source else ""
+        sections.append(
+            f"<section>\n<h2>{title}</h2>\n<p>{date}{source}</p>\n"
+            + f"{makeHtml(closing(io.StringIO(text)), colorStrategy=eclassColor)}\n"
+            + "</section>\n"
+        )
+    return "".join(sections)
+
+
+def _renderJson(elogs: Sequence[Elog]) -> str:
+    lines: list[str] = []
+    for elog in elogs:
+        text = _read(elog)
+        if text is None:
+            continue
+        record = {
+            "filename": str(elog.filename),
+            "source": elog.source,
+            "category": elog.category,
+            "package": elog.package,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S", elog.date),
+            "eclass": elog.eclass.value,
+            "contents": text,
+        }
+        lines.append(f"{json.dumps(record, ensure_ascii=False)}\n")
+    return "".join(lines)
+
+
+# The renderers by format, with the text around the rendered elogs.
+EXPORT_FORMATS: Final[dict[str, tuple[Callable[[Sequence[Elog]], str], str, str]]] = {
+    "html": (_renderHtml, _HTML_HEAD, _HTML_TAIL),
+    "jsonl": (_renderJson, "", ""),
+}
+
+
+def _renderChunk(
+    render: Callable[[Sequence[Elog]], str],
+    elogs: Sequence[Elog],
+    archives: Collection[Path],
+) -> str:
+    # The workers do not share the archives loaded by the parent unless
+    # they are forked.
+    openArchives(archives)
+    return render(elogs)
+
+
+def exportElogs(
+    elogs: Iterable[Elog],
+    out: IO[str],
+    *,
+    fmt: str,
+    workers: int | None = None,
+) -> None:
+    """Write `elogs` to `out` in the format `fmt`, in order.
+
+    The elogs are read and rendered by a pool of `workers` processes, and
+    written as they come, so that the memory does not grow with the
+    number of elogs.
+    """
+    render, head, tail = EXPORT_FORMATS[fmt]
+    out.write(head)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        ahead = _CHUNKS_AHEAD * workers
+        pending: deque[Future[str]] = deque()
+        for chunk in itertools.batched(elogs, _CHUNK_SIZE):
+            archives = {
+                archive
+                for elog in chunk
+                if (archive := archiveOf(elog.filename)) is not None
+            }
+            pending.append(pool.submit(_renderChunk, render, chunk, archives))
+            if len(pending) >= ahead:
+                out.write(pending.popleft().result())
+        while pending:
+            out.write(pending.popleft().result())
+    out.write(tail)
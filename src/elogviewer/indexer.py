@@ -0,0 +1,343 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import errno
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final, Protocol, final, override
+
+from .eclass import EClass
+from .elog import Elog, loadElogs, scanSources
+from .throttle import Throttle, lowerPriority
+
+_LOGGER = logging.getLogger("elogviewer")
+
+# Number of refreshes kept to answer the queries for changes.
+_HISTORY: Final = 256
+# Seconds between two checks of the elog directories.
+POLL_INTERVAL: Final = 2.0
+
+
+def indexerSocketFilename() -> Path:
+    runtimeDir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtimeDir:
+        # The directory is checked to be ours before use, see `_isPrivate()`.
+        return Path(f"/tmp/elogviewer-{os.getuid()}") / "indexer.sock"
+    return Path(runtimeDir) / "elogviewer" / "indexer.sock"
+
+
+def _isPrivate(directory: Path) -> bool:
+    """Whether `directory` is a real directory that only the user can access.
+
+    Anybody may create it first in a shared directory such as /tmp.
+    """
+    try:
+        st = directory.lstat()
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(st.st_mode)
+        and st.st_uid == os.getuid()
+        and not st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+    )
+
+
+def _claimSocket(filename: Path) -> None:
+    """Make the directory of `filename` and remove a stale socket there.
+
+    Raise OSError if the directory is not private or an indexer listens.
+    """
+    filename.parent.mkdir(exist_ok=True, mode=0o700)
+    if not _isPrivate(filename.parent):
+        raise PermissionError(
+            errno.EACCES, "the directory is not private", str(filename.parent)
+        )
+    if _isListening(filename):
+        raise OSError(errno.EADDRINUSE, "an indexer is already running", str(filename))
+    filename.unlink(missing_ok=True)
+
+
+@final
+@dataclass(frozen=True)
+class IndexDelta:
+    """The answer of an indexer to `query()`.
+
+    If `full`, `elogs` lists every elog and `removed` is empty.  Otherwise
+    they are the elogs added and the filenames removed since the queried
+    generation.
+    """
+
+    generation: int
+    full: bool
+    elogs: Sequence[Elog]
+    removed: Sequence[Path]
+
+
+class Indexer(Protocol):
+    def query(self, since: int | None = None) -> IndexDelta:
+        """The elogs, or the changes since the generation `since`."""
+        ...
+
+
+def _stamp(sources: Iterable[Path]) -> tuple[int, ...]:
+    # Adding or removing an elog changes the mtime of its directory.
+    stamps: list[int] = []
+    for path in sources:
+        try:
+            stamps.append(path.stat().st_mtime_ns)
+            if path.is_dir():
+                with os.scandir(path) as it:
+                    stamps.extend(
+                        entry.stat().st_mtime_ns
+                        for entry in it
+                        if entry.is_dir(follow_symlinks=False)
+                    )
+        except OSError:
+            stamps.append(-1)
+    return tuple(stamps)
+
+
+@final
+class ElogIndex:
+    """The elogs in `sources`, kept up to date by `refresh()`.
+
+    This is the index served by the indexer process and it answers the
+    queries in the same way when used in process.
+    """
+
+    def __init__(
+        self,
+        sources: Mapping[Path, str],
+        *,
+        throttle: Throttle | None = None,
+    ) -> None:
+        self.sources: Final = dict(sources)
+        self.throttle: Final = throttle
+        self._lock = threading.Lock()
+        self._elogs: dict[Path, Elog] = {}
+        # Start from the clock so that the generations known to the
+        # clients of a previous indexer are too old and get the full list.
+        self._generation = time.time_ns()
+        self._history: deque[tuple[int, Sequence[Elog], Sequence[Path]]] = deque(
+            maxlen=_HISTORY
+        )
+        self._stamp: tuple[int, ...] = ()
+
+    def refresh(self) -> bool:
+        """Scan the sources again if they changed, return whether they did."""
+        stamp = _stamp(self.sources)
+        if stamp == self._stamp:
+            return False
+        found = scanSources(self.sources)
+        with self._lock:
+            known = frozenset(self._elogs)
+        removed = known.difference(found)
+        added = loadElogs(
+            (f for f in found if f not in known), self.sources, throttle=self.throttle
+        )
+        with self._lock:
+            for filename in removed:
+                del self._elogs[filename]
+            self._elogs.update((elog.filename, elog) for elog in added)
+            self._generation += 1
+            self._history.append((self._generation, added, list(removed)))
+        self._stamp = stamp
+        return bool(added or removed)
+
+    def query(self, since: int | None = None) -> IndexDelta:
+        with self._lock:
+            oldest = self._history[0][0] if self._history else self._generation + 1
+            if since is None or not oldest - 1 <= since <= self._generation:
+                return IndexDelta(
+                    self._generation, True, list(self._elogs.values()), []
+                )
+            added: dict[Path, Elog] = {}
+            removed: set[Path] = set()
+            for generation, elogs, filenames in self._history:
+                if generation <= since:
+                    continue
+                for filename in filenames:
+                    if added.pop(filename, None) is None:
+                        removed.add(filename)
+                added.update((elog.filename, elog) for elog in elogs)
+            return IndexDelta(
+                self._generation, False, list(added.values()), list(removed)
+            )
+
+
+# The protocol is one JSON request line, then a JSON header line and one
+# line per elog in the answer.
+
+
+def _sourcesKey(sources: Mapping[Path, str]) -> list[list[str]]:
+    return [[str(path), name] for path, name in sorted(sources.items())]
+
+
+def _elogLine(elog: Elog) -> str:
+    return f"{elog.eclass.value}\t{elog.digest}\t{elog.source}\t{elog.filename}\n"
+
+
+def _parseElogLine(line: str) -> Elog:
+    eclass, digest, source, path = line.rstrip("\n").split("\t", 3)
+    head, _, name = path.rpartition("/")
+    category, package, date = Elog.parseName(name, head.rpartition("/")[2])
+    return Elog(
+        Path(path), category, package, date, EClass(eclass), None, source, digest
+    )
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    @override
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            # `_isListening()` probing.
+            return
+        request = json.loads(line)
+        assert isinstance(self.server, IndexerServer)
+        index = self.server.index
+        if request.get("sources") != _sourcesKey(index.sources):
+            header = {"error": "the indexer serves other sources"}
+            self.wfile.write(f"{json.dumps(header)}\n".encode())
+            return
+        if request.get("probe"):
+            # `SocketIndexer.probe()`, the sources match.
+            self.wfile.write(b"{}\n")
+            return
+        delta = index.query(request.get("since"))
+        header = {
+            "generation": delta.generation,
+            "full": delta.full,
+            "removed": [str(filename) for filename in delta.removed],
+        }
+        self.wfile.write(f"{json.dumps(header)}\n".encode())
+        self.wfile.writelines(
+            _elogLine(elog).encode(errors="surrogateescape") for elog in delta.elogs
+        )
+
+
+@final
+class IndexerServer(socketserver.ThreadingUnixStreamServer):
+    """Answer the queries to `index` on the Unix socket `filename`."""
+
+    daemon_threads = True
+
+    def __init__(self, filename: Path, index: ElogIndex) -> None:
+        self.index: Final = index
+        _claimSocket(filename)
+        super().__init__(str(filename), _Handler)
+
+
+def serve(
+    filename: Path,
+    sources: Mapping[Path, str],
+    *,
+    interval: float = POLL_INTERVAL,
+    bytesPerSecond: float = 0,
+) -> None:
+    """Keep the index of `sources` warm and serve it until interrupted.
+
+    The index is refreshed at idle priority after the first scan, and
+    the elogs are read at most at `bytesPerSecond` if set.  Raise OSError
+    if the socket cannot be used.
+    """
+    # Fail before the first scan, the server claims it again after.
+    _claimSocket(filename)
+    index = ElogIndex(sources, throttle=Throttle(bytesPerSecond))
+    index.refresh()
+    stopped = threading.Event()
+
+    def poll() -> None:
+        # Do not compete with the builds that write the elogs.
+        lowerPriority()
+        while not stopped.wait(interval):
+            try:
+                if index.refresh():
+                    _LOGGER.info("index updated")
+            except Exception:
+                _LOGGER.exception("could not refresh the index")
+
+    poller = threading.Thread(target=poll, daemon=True)
+    poller.start()
+    with IndexerServer(filename, index) as server:
+        _LOGGER.info("%s: serving %i elogs", filename, len(index.query().elogs))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stopped.set()
+            filename.unlink(missing_ok=True)
+
+
+@final
+class SocketIndexer:
+    """Query the indexer process listening on `filename`."""
+
+    def __init__(self, filename: Path, sources: Mapping[Path, str]) -> None:
+        self.filename: Final = filename
+        self.sources: Final = dict(sources)
+
+    def query(self, since: int | None = None) -> IndexDelta:
+        request = {"sources": _sourcesKey(self.sources), "since": since}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(self.filename))
+            sock.sendall(f"{json.dumps(request)}\n".encode())
+            with sock.makefile(encoding="utf-8", errors="surrogateescape") as f:
+                header = json.loads(f.readline())
+                if "error" in header:
+                    raise ValueError(header["error"])
+                elogs = [_parseElogLine(line) for line in f]
+        return IndexDelta(
+            header["generation"],
+            header["full"],
+            elogs,
+            [Path(filename) for filename in header["removed"]],
+        )
+
+    def probe(self) -> None:
+        """Raise ValueError if the indexer serves other sources."""
+        request = {"sources": _sourcesKey(self.sources), "probe": True}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(self.filename))
+            sock.sendall(f"{json.dumps(request)}\n".encode())
+            with sock.makefile(encoding="utf-8") as f:
+                header = json.loads(f.readline())
+        if "error" in header:
+            raise ValueError(header["error"])
+
+
+def _isListening(filename: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(filename))
+        except OSError:
+            return False
+    return True
+
+
+def connectIndexer(filename: Path, sources: Mapping[Path, str]) -> SocketIndexer | None:
+    """Return the indexer listening on `filename` if it serves `sources`."""
+    if not _isPrivate(filename.parent):
+        # Another user could serve anything there.
+        return None
+    indexer = SocketIndexer(filename, sources)
+    try:
+        indexer.probe()
+    except OSError:
+        return None
+    except ValueError as exc:
+        _LOGGER.warning("%s: %s", filename, exc)
+        return None
+    return indexer
@@ -0,0 +1,195 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from collections.abc import Collection, Container, Iterable, Mapping
+from pathlib import Path
+from typing import Final, final, override
+
+_LOGGER = logging.getLogger("elogviewer")
+
+_READ: Final = "r"
+_IMPORTANT: Final = "i"
+
+# Rewrite the journal once it holds that many times more entries than
+# there are names in the store.
+_COMPACT_RATIO: Final = 4
+_COMPACT_MIN_ENTRIES: Final = 1024
+
+
+def pathKey(filename: Path) -> int:
+    # 64 bits keep collisions unlikely for millions of elogs.
+    return int.from_bytes(
+        hashlib.blake2b(os.fsencode(filename), digest_size=8).digest()
+    )
+
+
+@final
+class _KeySet(Container[Path]):
+    def __init__(self, keys: frozenset[int]) -> None:
+        self._keys = keys
+
+    @override
+    def __contains__(self, filename: object) -> bool:
+        return isinstance(filename, Path) and pathKey(filename) in self._keys
+
+
+@final
+class JournalStateStore:
+    """Record the changes to the read and important states in a journal.
+
+    Names are stored as 64-bit hashes of the paths, with the hash of
+    their directory to only prune the directories scanned.  Changes are buffered
+    until `flush()` appends them to the file.  `setRead()` and
+    `setImportant()` only cost the changes, `saveRead()` and
+    `saveImportant()` compare every name.
+    """
+
+    def __init__(self, filename: Path) -> None:
+        self.filename: Final = filename
+        self._keys: dict[str, set[int]] = {_READ: set(), _IMPORTANT: set()}
+        # The directory of every name.  Entries from older journals have none
+        # and are never pruned.
+        self._dirs: dict[int, int] = {}
+        self._pending: list[str] = []
+        self._entryCount = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with self.filename.open(encoding="ascii") as f:
+                for line in f:
+                    self._entryCount += 1
+                    try:
+                        op, flag = line[0], line[1]
+                        fields = line[3:].split("\t")
+                        key = int(fields[0], 16)
+                        dirKey = int(fields[1], 16) if len(fields) > 1 else None
+                        keys = self._keys[flag]
+                    except (IndexError, KeyError, ValueError):
+                        _LOGGER.warning("%s: skipping bad entry", self.filename)
+                        continue
+                    if op == "+":
+                        keys.add(key)
+                        if dirKey is not None:
+                            self._dirs[key] = dirKey
+                    else:
+                        keys.discard(key)
+        except (FileNotFoundError, UnicodeDecodeError):
+            pass
+
+    def exists(self) -> bool:
+        return self.filename.exists()
+
+    def hasPendingChanges(self) -> bool:
+        return bool(self._pending)
+
+    def loadRead(self) -> Container[Path]:
+        return _KeySet(frozenset(self._keys[_READ]))
+
+    def loadImportant(self) -> Container[Path]:
+        return _KeySet(frozenset(self._keys[_IMPORTANT]))
+
+    def saveRead(self, names: frozenset[Path]) -> None:
+        self._save(_READ, names)
+
+    def saveImportant(self, names: frozenset[Path]) -> None:
+        self._save(_IMPORTANT, names)
+
+    def setRead(self, changes: Mapping[Path, bool]) -> None:
+        """Mark the elogs in `changes` read or unread."""
+        self._set(_READ, changes)
+
+    def setImportant(self, changes: Mapping[Path, bool]) -> None:
+        """Mark the elogs in `changes` important or not."""
+        self._set(_IMPORTANT, changes)
+
+    def prune(self, names: Collection[Path]) -> None:
+        """Forget the state of the elogs missing from the directories of `names`.
+
+        The elogs of the other directories, scanned another time or missing
+        or unmounted now, keep their state.
+        """
+        existing = {pathKey(name) for name in names}
+        scanned = {pathKey(name.parent) for name in names}
+        for flag, keys in self._keys.items():
+            missing = {key for key in keys - existing if self._dirs.get(key) in scanned}
+            self._record("-", flag, missing)
+            keys -= missing
+
+    def rename(self, renamed: Mapping[Path, Path]) -> None:
+        """Move the states of the elogs renamed from and to `renamed`."""
+        for old, new in renamed.items():
+            oldKey, newKey = pathKey(old), pathKey(new)
+            self._dirs[newKey] = pathKey(new.parent)
+            for flag, keys in self._keys.items():
+                if oldKey in keys:
+                    keys.remove(oldKey)
+                    keys.add(newKey)
+                    self._record("-", flag, (oldKey,))
+                    self._record("+", flag, (newKey,))
+
+    def _save(self, flag: str, names: Iterable[Path]) -> None:
+        byKey = {pathKey(name): name for name in names}
+        current = self._keys[flag]
+        for key in byKey.keys() - current:
+            self._dirs[key] = pathKey(byKey[key].parent)
+        self._record("+", flag, byKey.keys() - current)
+        self._record("-", flag, current - byKey.keys())
+        self._keys[flag] = set(byKey)
+
+    def _set(self, flag: str, changes: Mapping[Path, bool]) -> None:
+        keys = self._keys[flag]
+        for name, state in changes.items():
+            key = pathKey(name)
+            if state and key not in keys:
+                keys.add(key)
+                self._dirs[key] = pathKey(name.parent)
+                self._record("+", flag, (key,))
+            elif not state and key in keys:
+                keys.remove(key)
+                self._record("-", flag, (key,))
+
+    def _record(self, op: str, flag: str, keys: Iterable[int]) -> None:
+        self._pending.extend(self._entry(op, flag, key) for key in keys)
+
+    def _entry(self, op: str, flag: str, key: int) -> str:
+        dirKey = self._dirs.get(key) if op == "+" else None
+        if dirKey is None:
+            return f"{op}{flag}\t{key:016x}\n"
+        return f"{op}{flag}\t{key:016x}\t{dirKey:016x}\n"
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        liveCount = sum(len(keys) for keys in self._keys.values())
+        if self._entryCount + len(self._pending) > max(
+            _COMPACT_MIN_ENTRIES, _COMPACT_RATIO * liveCount
+        ):
+            self.compact()
+            return
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        with self.filename.open("a", encoding="ascii") as f:
+            f.writelines(self._pending)
+        self._entryCount += len(self._pending)
+        self._pending.clear()
+
+    def compact(self) -> None:
+        """Replace the journal with a snapshot of the current state."""
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        tmpFilename = self.filename.with_name(f".{self.filename.name}.tmp")
+        entries = [
+            self._entry("+", flag, key)
+            for flag, keys in self._keys.items()
+            for key in keys
+        ]
+        live = {key for keys in self._keys.values() for key in keys}
+        self._dirs = {key: d for key, d in self._dirs.items() if key in live}
+        with tmpFilename.open("w", encoding="ascii") as f:
+            f.writelines(entries)
+        os.replace(tmpFilename, self.filename)
+        self._entryCount = len(entries)
+        self._pending.clear()
@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import os
+import re
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Final
+
+_ASSIGNMENT_PATTERN: Final = re.compile(
+    r"""^\s*(?:export\s+)?(\w+)=(?:"([^"]*)"|'([^']*)'|([^\s#]*))\s*(?:#.*)?$"""
+)
+_VARIABLE_PATTERN: Final = re.compile(r"\$\{(\w+)\}|\$(\w+)")
+
+MAKE_CONF_FILENAMES: Final = (
+    Path("/usr/share/portage/config/make.globals"),
+    Path("/etc/make.conf"),
+    Path("/etc/portage/make.conf"),
+)
+
+
+def _expand(value: str, variables: Mapping[str, str]) -> str:
+    return _VARIABLE_PATTERN.sub(
+        lambda m: variables.get(m[1] or m[2], ""),
+        value,
+    )
+
+
+def readMakeConf(filenames: Iterable[Path]) -> dict[str, str]:
+    """Read the assignments in the `make.conf` files in `filenames`.
+
+    Only handle the one-line assignments, which is enough for the paths.
+    Later files override earlier ones and `make.conf` may be a directory.
+    """
+    variables: dict[str, str] = {}
+    for filename in filenames:
+        paths = sorted(filename.iterdir()) if filename.is_dir() else [filename]
+        for path in paths:
+            try:
+                lines = path.read_text(errors="replace").splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                match = _ASSIGNMENT_PATTERN.match(line)
+                if match is None:
+                    continue
+                name, doubleQuoted, singleQuoted, bare = match.groups()
+                if singleQuoted is not None:
+                    variables[name] = singleQuoted
+                else:
+                    variables[name] = _expand(doubleQuoted or bare or "", variables)
+    return variables
+
+
+def elogpathFromMakeConf(
+    filenames: Iterable[Path] = MAKE_CONF_FILENAMES,
+    environ: Mapping[str, str] = os.environ,
+) -> Path:
+    """The elog directory as portage would configure it."""
+    # Like portage, the environment overrides the configuration.
+    variables = readMakeConf(filenames) | {
+        name: environ[name] for name in ("EPREFIX", "PORT_LOGDIR") if name in environ
+    }
+    logdir = variables.get("PORT_LOGDIR") or (
+        f"{variables.get('EPREFIX', '').rstrip('/')}/var/log/portage"
+    )
+    return Path(logdir) / "elog"
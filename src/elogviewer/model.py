@@ -1,14 +1,20 @@
 # SPDX-License-Identifier: GPL-2.0-only
 
+import bisect
+import dataclasses
 import enum
 import io
+import math
+import re
 import time
+from collections import Counter
+from collections.abc import Collection, Container, Iterable, Mapping, Sequence
 from contextlib import AbstractContextManager, closing
 from pathlib import Path
 from typing import IO, Final, Protocol, final
 
 from .eclass import EClass
-from .elog import Elog
+from .elog import Elog, isArchiveMember
 
 
 class _ReadState(enum.Enum):
@@ -28,6 +34,13 @@ class _ImportantState(enum.Enum):
 IMPORTANT: Final = _ImportantState.IMPORTANT
 UNIMPORTANT: Final = _ImportantState.UNIMPORTANT
 
+# Elogs further apart than this, in seconds, belong to different emerge
+# sessions.  Building a large package can take a while.
+SESSION_GAP: Final = 2 * 60 * 60
+
+# Split "name-1.2.3_p4-r1" into the package name and its version.
+_VERSION_PATTERN: Final = re.compile(r"-\d[^-]*(?:-r\d+)?$")
+
 
 class Column(enum.IntEnum):
     ImportantState = 0
@@ -36,10 +49,20 @@ class Column(enum.IntEnum):
     ReadState = 3
     Eclass = 4
     Date = 5
+    Source = 6
+    Duplicates = 7
 
 
 @final
 class ElogModelItem:
+    __slots__ = (
+        "_displayTexts",
+        "_elog",
+        "_importantState",
+        "_readState",
+        "_sortKeys",
+    )
+
     def __init__(
         self,
         elog: Elog,
@@ -49,16 +72,37 @@ class ElogModelItem:
         self._elog = elog
         self._readState = readState
         self._importantState = importantState
+        # Computed on first display, indexed by `Column`.
+        self._displayTexts: tuple[str, ...] | None = None
+        self._sortKeys: tuple[str, ...] | None = None
 
     def filename(self) -> Path:
         return self._elog.filename
 
+    def setFilename(self, filename: Path) -> None:
+        self._elog = dataclasses.replace(self._elog, filename=filename)
+
     def category(self) -> str:
         return self._elog.category
 
     def package(self) -> str:
         return self._elog.package
 
+    def packageName(self) -> str:
+        """The package without its version."""
+        return _VERSION_PATTERN.sub("", self._elog.package)
+
+    def source(self) -> str:
+        return self._elog.source
+
+    def digest(self) -> str:
+        return self._elog.digest
+
+    def timestamp(self) -> float:
+        """The date of the elog in seconds since the epoch."""
+        # Portage names the elogs after the local time.
+        return time.mktime(self._elog.date)
+
     def isoTime(self) -> str:
         return time.strftime("%Y-%m-%d %H:%M:%S", self._elog.date)
 
@@ -68,6 +112,35 @@ class ElogModelItem:
     def eclass(self) -> EClass:
         return self._elog.eclass
 
+    def displayText(self, column: int) -> str:
+        if self._displayTexts is None:
+            texts = {
+                Column.Category: self.category(),
+                Column.Package: self.package(),
+                Column.Eclass: self.eclass().name,
+                Column.Date: self.localeTime(),
+                Column.Source: self.source(),
+            }
+            self._displayTexts = tuple(texts.get(col, "") for col in Column)
+        return self._displayTexts[column]
+
+    def sortKey(self, column: int) -> str:
+        if self._sortKeys is None:
+            isoTime = self.isoTime()
+            keys = {
+                Column.Date: isoTime,
+                Column.Eclass: self.eclass().value,
+                Column.Category: self.category().lower(),
+                Column.Package: self.package().lower(),
+                Column.Source: self.source().lower(),
+            }
+            self._sortKeys = tuple(f"{keys.get(col, '')}{isoTime}" for col in Column)
+        if column == Column.ImportantState:
+            return f"{self.isImportantState()}{self._sortKeys[column]}"
+        if column == Column.ReadState:
+            return f"{self.isReadState()}{self._sortKeys[column]}"
+        return self._sortKeys[column]
+
     def readState(self) -> _ReadState:
         return self._readState
 
@@ -87,11 +160,192 @@ class ElogModelItem:
         return self.importantState() is IMPORTANT
 
     def file(self) -> AbstractContextManager[IO[str]]:
-        return closing(io.StringIO(self._elog.contents))
+        return closing(io.StringIO(self._elog.read()))
+
+
+@final
+class ElogGroup:
+    """The elogs of one package and their aggregated columns.
+
+    The aggregates are updated with every elog added or removed, and with
+    `refresh()` after an elog changed state.
+    """
+
+    __slots__ = ("_eclassCounts", "_items", "_latest", "_unread", "category", "name")
+
+    def __init__(self, category: str, name: str) -> None:
+        self.category: Final = category
+        self.name: Final = name
+        self._items: list[ElogModelItem] = []
+        self._eclassCounts: Counter[EClass] = Counter()
+        self._unread: set[ElogModelItem] = set()
+        self._latest: ElogModelItem | None = None
+
+    @staticmethod
+    def key(item: ElogModelItem) -> tuple[str, str]:
+        return item.category(), item.packageName()
+
+    def items(self) -> Sequence[ElogModelItem]:
+        return self._items
+
+    def count(self) -> int:
+        return len(self._items)
+
+    def unreadCount(self) -> int:
+        return len(self._unread)
+
+    def worstEclass(self) -> EClass:
+        # `EClass` is ordered from the most to the least severe.
+        return next((e for e in EClass if self._eclassCounts[e]), EClass.Log)
+
+    def latest(self) -> ElogModelItem | None:
+        if self._latest is None and self._items:
+            self._latest = max(self._items, key=lambda i: i.sortKey(Column.Date))
+        return self._latest
+
+    def addItems(self, items: Iterable[ElogModelItem]) -> None:
+        for item in items:
+            self._items.append(item)
+            self._eclassCounts[item.eclass()] += 1
+            self.refresh(item)
+            if self._latest is not None and item.sortKey(
+                Column.Date
+            ) > self._latest.sortKey(Column.Date):
+                self._latest = item
+
+    def removeItems(self, first: int, last: int) -> None:
+        """Remove the items from `first` to `last` inclusive."""
+        for item in self._items[first : last + 1]:
+            self._eclassCounts[item.eclass()] -= 1
+            self._unread.discard(item)
+            if item is self._latest:
+                self._latest = None
+        del self._items[first : last + 1]
+
+    def refresh(self, item: ElogModelItem) -> None:
+        if item.isReadState():
+            self._unread.discard(item)
+        else:
+            self._unread.add(item)
 
 
 class StateStore(Protocol):
-    def loadRead(self) -> frozenset[Path]: ...
-    def loadImportant(self) -> frozenset[Path]: ...
+    def loadRead(self) -> Container[Path]: ...
+    def loadImportant(self) -> Container[Path]: ...
     def saveRead(self, names: frozenset[Path]) -> None: ...
     def saveImportant(self, names: frozenset[Path]) -> None: ...
+    def setRead(self, changes: Mapping[Path, bool]) -> None: ...
+    def setImportant(self, changes: Mapping[Path, bool]) -> None: ...
+    def prune(self, names: Collection[Path]) -> None: ...
+
+
+@final
+class PackageHistory:
+    """The elogs of every package in date order.
+
+    The elogs are grouped like in `ElogGroup`, by category and package
+    without version, so that an elog follows the one of the previous
+    version.
+    """
+
+    __slots__ = ("_byKey", "_previous")
+
+    def __init__(self, items: Iterable[ElogModelItem]) -> None:
+        self._byKey: dict[tuple[str, str], list[ElogModelItem]] = {}
+        for item in items:
+            self._byKey.setdefault(ElogGroup.key(item), []).append(item)
+        self._previous: dict[ElogModelItem, ElogModelItem] = {}
+        for history in self._byKey.values():
+            history.sort(key=lambda item: item.sortKey(Column.Date))
+            self._previous.update(zip(history[1:], history, strict=False))
+
+    def history(self, item: ElogModelItem) -> Sequence[ElogModelItem]:
+        """The elogs of the package of `item`, oldest first."""
+        return self._byKey.get(ElogGroup.key(item), ())
+
+    def previous(self, item: ElogModelItem) -> ElogModelItem | None:
+        """The elog of the same package logged before `item`."""
+        return self._previous.get(item)
+
+    def packages(self) -> Iterable[Sequence[ElogModelItem]]:
+        """The elogs of every package, oldest first."""
+        return self._byKey.values()
+
+
+@final
+@dataclasses.dataclass(frozen=True)
+class RetentionPolicy:
+    """Which elogs to delete to keep the directory small.
+
+    The elogs beyond the newest `keepPerPackage` of their package or
+    older than `maxAgeDays` expire, unless important and `keepImportant`.
+    A limit of zero is disabled.  The members of tar archives cannot be
+    deleted and never expire.
+    """
+
+    keepPerPackage: int = 0
+    maxAgeDays: float = 0
+    keepImportant: bool = True
+
+    def expired(
+        self,
+        history: PackageHistory,
+        *,
+        now: float | None = None,
+    ) -> list[ElogModelItem]:
+        if now is None:
+            now = time.time()
+        oldest = now - self.maxAgeDays * 86400 if self.maxAgeDays else -math.inf
+        expired: list[ElogModelItem] = []
+        for items in history.packages():
+            kept = len(items) - self.keepPerPackage if self.keepPerPackage else 0
+            expired.extend(
+                item
+                for n, item in enumerate(items)
+                if (n < kept or item.timestamp() < oldest)
+                and not (self.keepImportant and item.isImportantState())
+                and not isArchiveMember(item.filename())
+            )
+        return expired
+
+
+def _first(pair: tuple[float, ElogModelItem]) -> float:
+    return pair[0]
+
+
+@final
+class DateIndex:
+    """The elogs sorted by date, for range queries and emerge sessions."""
+
+    __slots__ = ("_items", "_times")
+
+    def __init__(self, items: Iterable[ElogModelItem]) -> None:
+        pairs = sorted(((item.timestamp(), item) for item in items), key=_first)
+        self._times: Final = [stamp for stamp, _ in pairs]
+        self._items: Final = [item for _, item in pairs]
+
+    def between(self, start: float, end: float) -> Sequence[ElogModelItem]:
+        """The elogs logged from `start` to `end` included."""
+        first = bisect.bisect_left(self._times, start)
+        last = bisect.bisect_right(self._times, end)
+        return self._items[first:last]
+
+    def sessions(self, gap: float = SESSION_GAP) -> Sequence[tuple[float, float]]:
+        """The `(start, end)` of the runs of elogs less than `gap` apart."""
+        sessions: list[tuple[float, float]] = []
+        for stamp in self._times:
+            if sessions and stamp - sessions[-1][1] < gap:
+                sessions[-1] = (sessions[-1][0], stamp)
+            else:
+                sessions.append((stamp, stamp))
+        return sessions
+
+    def lastSession(self, gap: float = SESSION_GAP) -> tuple[float, float] | None:
+        """The `(start, end)` of the last run, found backwards from the end."""
+        if not self._times:
+            return None
+        end = self._times[-1]
+        first = len(self._times) - 1
+        while first and self._times[first] - self._times[first - 1] < gap:
+            first -= 1
+        return self._times[first], end
@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 import abc
+import difflib
+import html
+import itertools
 import weakref
-from typing import Protocol, Self, override
+from contextlib import AbstractContextManager
+from typing import IO, Protocol, Self, override
 
 from .eclass import EClass
 from .elog import Elog
@@ -171,3 +175,33 @@ class ParserFSM:
             return
         self.state = self._stateFor(line)
         self._results.append(self.state.parse(line))
+
+
+def makeHtml(
+    file: AbstractContextManager[IO[str]], *, colorStrategy: ColorStrategy
+) -> str:
+    parsed: list[str | None] = []
+    with ParserFSM(parsed, colorStrategy=colorStrategy) as parser, file as f:
+        for line in f:
+            parser.parse(line)
+    return "\n".join(_ for _ in parsed if _ is not None)
+
+
+def makeDiffHtml(previous: str, current: str) -> str:
+    """Render the lines added and removed since `previous`."""
+    lines: list[str] = []
+    diff = difflib.unified_diff(
+        previous.splitlines(), current.splitlines(), lineterm="", n=1
+    )
+    # Skip the `---` and `+++` header, the changed lines may look alike.
+    for line in itertools.islice(diff, 2, None):
+        text = html.escape(line[1:])
+        if line.startswith("@@"):
+            lines.append("<hr />")
+        elif line.startswith("+"):
+            lines.append(f'<span style="color:#008000">+ {text}</span><br />')
+        elif line.startswith("-"):
+            lines.append(f'<span style="color:#ff0000">- {text}</span><br />')
+        else:
+            lines.append(f"&nbsp;&nbsp;{text}<br />")
+    return "\n".join(lines)
@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import logging
+import os
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Final
+
+from .eclass import EClass
+from .elog import Elog
+from .model import IMPORTANT, READ, UNIMPORTANT, UNREAD, ElogModelItem
+
+_LOGGER = logging.getLogger("elogviewer")
+
+# Bump when the format changes, older snapshots are then ignored.
+_HEADER: Final = "elogviewer-snapshot 2"
+
+
+def _sourcesLine(sources: Mapping[Path, str]) -> str:
+    return "\t".join(f"{name}={path}" for path, name in sorted(sources.items()))
+
+
+def saveSnapshot(
+    filename: Path,
+    items: Iterable[ElogModelItem],
+    sources: Mapping[Path, str],
+) -> None:
+    """Save the rows of the model to show them at once next time."""
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    tmpFilename = filename.with_name(f".{filename.name}.tmp")
+    with tmpFilename.open("w", encoding="utf-8", errors="surrogateescape") as f:
+        f.write(f"{_HEADER}\n{_sourcesLine(sources)}\n")
+        f.writelines(
+            f"{item.isReadState():d}{item.isImportantState():d}"
+            + f"\t{item.eclass().value}\t{item.digest()}\t{item.source()}"
+            + f"\t{item.filename()}\n"
+            for item in items
+        )
+    os.replace(tmpFilename, filename)
+
+
+def loadSnapshot(
+    filename: Path,
+    sources: Mapping[Path, str],
+) -> list[ElogModelItem] | None:
+    """Load the rows saved by `saveSnapshot()` for the same `sources`.
+
+    Return None if there is no usable snapshot.
+    """
+    try:
+        with filename.open(encoding="utf-8", errors="surrogateescape") as f:
+            if f.readline() != f"{_HEADER}\n":
+                return None
+            if f.readline() != f"{_sourcesLine(sources)}\n":
+                return None
+            items: list[ElogModelItem] = []
+            for line in f:
+                flags, eclass, digest, source, path = line.rstrip("\n").split("\t", 4)
+                # Parse the string, `Path` is slow to split.
+                head, _, name = path.rpartition("/")
+                category, package, date = Elog.parseName(name, head.rpartition("/")[2])
+                items.append(
+                    ElogModelItem(
+                        Elog(
+                            Path(path),
+                            category,
+                            package,
+                            date,
+                            EClass(eclass),
+                            None,
+                            source,
+                            digest,
+                        ),
+                        READ if flags[0] == "1" else UNREAD,
+                        IMPORTANT if flags[1] == "1" else UNIMPORTANT,
+                    )
+                )
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, IndexError) as exc:
+        _LOGGER.warning("%s: ignoring the snapshot: %s", filename, exc)
+        return None
+    return items
@@ -0,0 +1,155 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import bz2
+import gzip
+import hashlib
+import logging
+import lzma
+import os
+import tarfile
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Final, cast, final
+
+from .eclass import EClass
+
+_LOGGER = logging.getLogger("elogviewer")
+
+
+def _openTar(filename: str | Path, mode: str = "rb") -> IO[bytes]:
+    # Look `open` up on every call, pyfakefs patches it in the tests.
+    return open(filename, mode)
+
+
+# Openers of the uncompressed tar stream by archive suffix.
+_STREAM_OPENERS: Final = cast(
+    dict[str, Callable[..., IO[bytes]]],
+    {
+        ".tar": _openTar,
+        ".tgz": gzip.open,
+        ".gz": gzip.open,
+        ".bz2": bz2.open,
+        ".xz": lzma.open,
+    },
+)
+# Bump when the format of the cached index changes.
+_INDEX_VERSION: Final = 3
+
+
+def isTarArchive(filename: Path) -> bool:
+    suffixes = filename.suffixes[-2:]
+    return filename.suffix in (".tar", ".tgz") or (
+        len(suffixes) == 2 and suffixes[0] == ".tar" and suffixes[1] in _STREAM_OPENERS
+    )
+
+
+def _cacheDirectory() -> Path:
+    cacheHome = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cacheHome) / "elogviewer" / "tarindex"
+
+
+@final
+@dataclass(frozen=True)
+class TarMember:
+    name: str
+    # Offset of the data in the uncompressed tar stream.
+    offset: int
+    size: int
+    eclass: EClass
+    digest: str
+
+
+@final
+class TarIndex:
+    """The offsets of the elogs in a tar archive.
+
+    The index is built once, cached on disk and reused as long as the
+    archive does not change.  Reading a member then seeks straight to its
+    data instead of walking the archive.
+    """
+
+    def __init__(self, filename: Path, members: Iterable[TarMember]) -> None:
+        self.filename: Final = filename
+        self._members: Final = {member.name: member for member in members}
+
+    @classmethod
+    def load(
+        cls, filename: Path, *, scan: Callable[[str, bytes], tuple[EClass, str]]
+    ) -> TarIndex:
+        """Load the index of `filename`, building it if needed.
+
+        `scan` gives the eclass and the digest of the members from their
+        name and data while building.
+        """
+        stat = filename.stat()
+        stamp = f"{_INDEX_VERSION} {stat.st_size} {stat.st_mtime_ns}"
+        cacheFilename = _cacheDirectory() / (
+            hashlib.blake2b(os.fsencode(filename.resolve()), digest_size=8).hexdigest()
+            + ".index"
+        )
+        try:
+            index = cls._read(filename, cacheFilename, stamp)
+        except (OSError, ValueError):
+            index = None
+        if index is not None:
+            return index
+        index = cls(filename, cls._build(filename, scan))
+        try:
+            index._write(cacheFilename, stamp)
+        except OSError as exc:
+            _LOGGER.warning("%s: could not cache the index: %s", filename, exc)
+        return index
+
+    @classmethod
+    def _read(cls, filename: Path, cacheFilename: Path, stamp: str) -> TarIndex | None:
+        with cacheFilename.open(encoding="utf-8") as f:
+            if f.readline().rstrip("\n") != stamp:
+                return None
+            members: list[TarMember] = []
+            for line in f:
+                offset, size, eclass, digest, name = line.rstrip("\n").split("\t", 4)
+                members.append(
+                    TarMember(name, int(offset), int(size), EClass(eclass), digest)
+                )
+        return cls(filename, members)
+
+    def _write(self, cacheFilename: Path, stamp: str) -> None:
+        cacheFilename.parent.mkdir(parents=True, exist_ok=True)
+        tmpFilename = cacheFilename.with_name(f".{cacheFilename.name}.tmp")
+        with tmpFilename.open("w", encoding="utf-8") as f:
+            f.write(f"{stamp}\n")
+            f.writelines(
+                f"{m.offset}\t{m.size}\t{m.eclass.value}\t{m.digest}\t{m.name}\n"
+                for m in self._members.values()
+            )
+        os.replace(tmpFilename, cacheFilename)
+
+    @staticmethod
+    def _build(
+        filename: Path, scan: Callable[[str, bytes], tuple[EClass, str]]
+    ) -> Iterable[TarMember]:
+        _LOGGER.info("%s: indexing", filename)
+        with tarfile.open(filename, "r:*") as tar:
+            for info in tar:
+                if not info.isfile() or ":" not in info.name.rpartition("/")[2]:
+                    continue
+                f = tar.extractfile(info)
+                assert f is not None
+                with f:
+                    eclass, digest = scan(info.name, f.read())
+                yield TarMember(info.name, info.offset_data, info.size, eclass, digest)
+
+    def members(self) -> Iterable[TarMember]:
+        return self._members.values()
+
+    def member(self, name: str) -> TarMember | None:
+        return self._members.get(name)
+
+    def read(self, member: TarMember) -> bytes:
+        """Return the data of `member`, decompressing only up to it."""
+        with _STREAM_OPENERS[self.filename.suffix](self.filename, "rb") as f:
+            f.seek(member.offset)
+            return f.read(member.size)
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+import ctypes
+import logging
+import os
+import platform
+import threading
+import time
+from typing import Final, final
+
+_LOGGER = logging.getLogger("elogviewer")
+
+# The nice value of the background workers, the lowest priority.
+_IDLE_NICE: Final = 19
+# `ioprio_set(2)` has no wrapper in the standard library, call it by number.
+_SYS_IOPRIO_SET: Final = {
+    "aarch64": 30,
+    "armv7l": 314,
+    "i386": 289,
+    "i686": 289,
+    "loongarch64": 30,
+    "ppc64": 273,
+    "ppc64le": 273,
+    "riscv64": 30,
+    "s390x": 282,
+    "x86_64": 251,
+}
+_IOPRIO_WHO_PROCESS: Final = 1
+_IOPRIO_CLASS_IDLE: Final = 3
+_IOPRIO_CLASS_SHIFT: Final = 13
+
+
+def lowerPriority() -> None:
+    """Run the calling thread at idle CPU and I/O priority.
+
+    The threads started from it afterwards inherit the priorities.  This
+    is a no-op where Linux does not support it.  Only lower the CPU
+    priority of the processes without a GUI: a thread holding the GIL at
+    idle priority would stall the other threads.
+    """
+    # On Linux, the id of a thread only sets the priorities of that thread.
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, _IDLE_NICE)
+        os.sched_setscheduler(tid, os.SCHED_IDLE, os.sched_param(0))
+    except (AttributeError, OSError) as exc:
+        _LOGGER.debug("could not lower the CPU priority: %s", exc)
+    lowerIoPriority()
+
+
+def lowerIoPriority() -> None:
+    """Run the calling thread at idle I/O priority, see `lowerPriority()`."""
+    tid = threading.get_native_id()
+    number = _SYS_IOPRIO_SET.get(platform.machine())
+    if number is None:
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    ioprio = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+    if libc.syscall(number, _IOPRIO_WHO_PROCESS, tid, ioprio) == -1:
+        _LOGGER.debug(
+            "could not lower the I/O priority: %s", os.strerror(ctypes.get_errno())
+        )
+
+
+@final
+class Throttle:
+    """Slow the background reads down to `bytesPerSecond`, 0 for no limit.
+
+    The readers also wait while `pauseFor()` holds them, so that the
+    interactive requests get the disk first.
+    """
+
+    def __init__(self, bytesPerSecond: float = 0) -> None:
+        self.bytesPerSecond = bytesPerSecond
+        self._lock = threading.Lock()
+        # When the bytes read so far are paid for.
+        self._due = 0.0
+        self._resumeAt = 0.0
+
+    def pauseFor(self, seconds: float) -> None:
+        """Hold the readers for the next `seconds`."""
+        with self._lock:
+            self._resumeAt = max(self._resumeAt, time.monotonic() + seconds)
+
+    def consume(self, size: int) -> None:
+        """Account for `size` bytes read and wait until they are paid for."""
+        with self._lock:
+            due = max(self._due, time.monotonic())
+            if self.bytesPerSecond > 0:
+                due += size / self.bytesPerSecond
+            self._due = due
+        # Another pause may come while waiting.
+        while (delay := max(due, self._resumeAt) - time.monotonic()) > 0:
+            time.sleep(delay)
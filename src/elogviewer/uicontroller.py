@@ -2,29 +2,140 @@
 
 from __future__ import annotations
 
-import glob
-import itertools
+import logging
+from collections.abc import Callable, Collection, Mapping, Sequence
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Final, Protocol
+from typing import Final, Protocol, final, override
 
 from PyQt6 import QtCore
 
-from .model import Column
-from .uimodel import Model, sourceIndex
+from .archive import compressOld
+from .elog import Elog, loadElogs, openArchives, scanSources
+from .indexer import Indexer
+from .journal import JournalStateStore
+from .model import Column, ElogModelItem, RetentionPolicy
+from .parser import makeDiffHtml
+from .snapshot import loadSnapshot, saveSnapshot
+from .throttle import Throttle, lowerIoPriority
+from .uimodel import GroupModel, Model, sourceIndex
 
 Qt = QtCore.Qt
 
 # Let the UI show up and paint before the first (blocking) scan of the
 # elog directory.
 _INITIAL_POPULATE_DELAY_MS: Final = 100
+# Batch the changes to the read and important states before writing them.
+_SAVE_DELAY_MS: Final = 2000
+# Above that many elogs, load the newest ones first and fetch the older
+# ones page by page when the view scrolls down.
+_LAZY_POPULATE_THRESHOLD: Final = 20_000
+_PAGE_SIZE: Final = 1_000
+# Number of failures listed in the error message after a bulk delete.
+_MAX_REPORTED_ERRORS: Final = 10
+# Interval between two queries for changes to a running indexer.
+_INDEXER_POLL_MS: Final = 2000
+# Seconds the background scans wait for when an elog is shown.
+_PREVIEW_PAUSE: Final = 0.5
+
+_LOGGER = logging.getLogger("elogviewer")
 
 
 class Config(Protocol):
     @property
-    def elogpath(self) -> Path: ...
+    def sources(self) -> Mapping[Path, str]:
+        """The elog directories and their names."""
+        ...
+
+
+class _TaskSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(object)
+
+
+@final
+@dataclass(frozen=True)
+class _Changes:
+    generation: int
+    indexerGeneration: int | None
+    # All the elogs on disk, unless only the changes are known.
+    found: Sequence[Path] | None
+    removed: Collection[Path]
+    added: Sequence[Elog]
+
+
+class _Task(QtCore.QRunnable):
+    """Run `fn` on a thread pool and emit its result.
+
+    The `background` tasks run at idle I/O priority.
+    """
+
+    def __init__(self, fn: Callable[[], object], *, background: bool = False) -> None:
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.background = background
+        self.signals = _TaskSignals()
+
+    @override
+    def run(self) -> None:
+        if self.background:
+            # Their CPU priority stays, they share the GIL with the GUI.
+            lowerIoPriority()
+        self.signals.finished.emit(self.fn())
+
+
+def _unlink(
+    filenames: Sequence[Path],
+) -> tuple[frozenset[Path], Sequence[tuple[Path, str]]]:
+    deleted: set[Path] = set()
+    errors: list[tuple[Path, str]] = []
+    for filename in filenames:
+        try:
+            filename.unlink(missing_ok=True)
+        except OSError as exc:
+            errors.append((filename, exc.strerror or str(exc)))
+        else:
+            deleted.add(filename)
+    return frozenset(deleted), errors
+
+
+def _errorMessage(action: str, errors: Sequence[tuple[Path, str]]) -> str:
+    message = "<br>".join(
+        f"'{filename}': <b>{strerror}</b>"
+        for filename, strerror in errors[:_MAX_REPORTED_ERRORS]
+    )
+    if len(errors) > _MAX_REPORTED_ERRORS:
+        message += f"<br>and {len(errors) - _MAX_REPORTED_ERRORS} more"
+    return f"Error while trying to {action} {len(errors)} elog(s):<br>{message}"
+
+
+def journalFilename() -> Path:
+    return (
+        Path(
+            QtCore.QStandardPaths.writableLocation(
+                QtCore.QStandardPaths.StandardLocation.GenericDataLocation
+            )
+        )
+        / "elogviewer"
+        / "state.journal"
+    )
+
+
+def snapshotFilename() -> Path:
+    return (
+        Path(
+            QtCore.QStandardPaths.writableLocation(
+                QtCore.QStandardPaths.StandardLocation.GenericCacheLocation
+            )
+        )
+        / "elogviewer"
+        / "snapshot"
+    )
 
 
 class StateStore:
+    """The `QSettings` store used before the journal, read for migration."""
+
     def __init__(self, settings: QtCore.QSettings) -> None:
         self.settings: Final = settings
 
@@ -46,6 +157,12 @@ class ElogviewerController(QtCore.QObject):
     unreadTextChanged = QtCore.pyqtSignal(str)
     errorOccurred = QtCore.pyqtSignal(str)
     rowSelectRequested = QtCore.pyqtSignal(int)
+    deleteFinished = QtCore.pyqtSignal()
+    compressFinished = QtCore.pyqtSignal()
+    pruneFinished = QtCore.pyqtSignal()
+    revalidated = QtCore.pyqtSignal()
+    # The elog and the HTML of its changes since the previous one.
+    diffReady = QtCore.pyqtSignal(object, str)
 
     def __init__(
         self,
@@ -53,30 +170,201 @@ class ElogviewerController(QtCore.QObject):
         proxyModel: QtCore.QSortFilterProxyModel,
         selectionModel: QtCore.QItemSelectionModel,
         config: Config,
+        *,
+        indexer: Indexer | None = None,
+        parent: QtCore.QObject | None = None,
     ) -> None:
-        super().__init__()
+        super().__init__(parent)
         self._model = model
         self._proxyModel = proxyModel
         self._proxyModel.setDynamicSortFilter(False)
         self._selectionModel = selectionModel
+        # The selection of the grouped view while it is shown.
+        self._groupedSelection: QtCore.QItemSelectionModel | None = None
         self.config = config
         self.settings = QtCore.QSettings("elogviewer", "elogviewer")
         if not self.settings.contains("readFlag"):
             self.settings.setValue("readFlag", set())
         if not self.settings.contains("importantFlag"):
             self.settings.setValue("importantFlag", set())
+        self._stateStore = JournalStateStore(journalFilename())
+        if not self._stateStore.exists():
+            legacyStore = StateStore(self.settings)
+            self._stateStore.saveRead(legacyStore.loadRead())
+            self._stateStore.saveImportant(legacyStore.loadImportant())
+            self._stateStore.flush()
+        self._saveTimer = QtCore.QTimer(self)
+        self._saveTimer.setSingleShot(True)
+        self._saveTimer.setInterval(_SAVE_DELAY_MS)
+        self._saveTimer.timeout.connect(self.flushSettings)
+        self._tasks: set[_Task] = set()
+        # Housekeeping runs one job at a time and yields to the rest.
+        self._backgroundPool = QtCore.QThreadPool(self)
+        self._backgroundPool.setMaxThreadCount(1)
+        self._backgroundPool.setThreadPriority(QtCore.QThread.Priority.LowestPriority)
+        # Slows the background scans down, see `scanBytesPerSecond`.
+        self.throttle: Final = Throttle()
+        self._rowBeforeDelete = -1
+        # Incremented on every refresh to drop outdated revalidations.
+        self._generation = 0
+        self._revalidating = False
+        self._indexer = indexer
+        self._indexerGeneration: int | None = None
+        self._indexerTimer = QtCore.QTimer(self)
+        self._indexerTimer.setInterval(_INDEXER_POLL_MS)
+        self._indexerTimer.timeout.connect(self.revalidate)
 
     def start(self) -> None:
-        timer = QtCore.QTimer(self)
-        timer.setSingleShot(True)
-        timer.timeout.connect(self.populate)
-        timer.start(_INITIAL_POPULATE_DELAY_MS)
+        items = loadSnapshot(snapshotFilename(), self.config.sources)
+        if items is not None or self._indexer is not None:
+            # The members of the archives are read through their index.
+            openArchives(self.config.sources)
+        if items is not None:
+            # Show the elogs known at exit at once, then catch up with disk.
+            self._model.restore(items, sources=self.config.sources)
+            self._sort()
+            self.rowSelectRequested.emit(0)
+            self.updateStatus()
+            self.updateUnreadCount()
+            self.revalidate()
+        elif self._indexer is not None:
+            # The indexer has the elogs at hand, no need to scan.
+            self._model.restore([], sources=self.config.sources)
+            self.revalidate()
+        else:
+            timer = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(self.populate)
+            timer.start(_INITIAL_POPULATE_DELAY_MS)
+        if self._indexer is not None:
+            self._indexerTimer.start()
+
+    def saveSnapshot(self) -> None:
+        if self._model.canFetchMore(QtCore.QModelIndex()):
+            # The elogs not fetched yet would be missing from the snapshot.
+            snapshotFilename().unlink(missing_ok=True)
+            return
+        saveSnapshot(snapshotFilename(), self._model.items(), self.config.sources)
+
+    def revalidate(self) -> None:
+        """Apply the elogs added to and removed from disk to the model.
+
+        With an indexer, ask it for the changes instead of scanning.
+        """
+        if self._revalidating:
+            return
+        self._revalidating = True
+        sources = self.config.sources
+        indexer = self._indexer
+        since = self._indexerGeneration
+        filenames = self._model.filenames()
+        generation = self._generation
+        throttle = self.throttle
+
+        def scan() -> _Changes:
+            # Compare the paths off the GUI thread, hashing them is slow.
+            known = frozenset(filenames)
+            if indexer is not None:
+                try:
+                    delta = indexer.query(since)
+                except (OSError, ValueError) as exc:
+                    _LOGGER.warning("indexer unavailable, scanning: %s", exc)
+                else:
+                    added = [e for e in delta.elogs if e.filename not in known]
+                    if not delta.full:
+                        return _Changes(
+                            generation, delta.generation, None, delta.removed, added
+                        )
+                    found = [elog.filename for elog in delta.elogs]
+                    return _Changes(
+                        generation,
+                        delta.generation,
+                        found,
+                        known.difference(found),
+                        added,
+                    )
+            found = scanSources(sources)
+            removed = known.difference(found)
+            added = loadElogs(
+                (f for f in found if f not in known), sources, throttle=throttle
+            )
+            return _Changes(generation, None, found, removed, added)
+
+        self._startTask(scan, self._onRevalidated, pool=self._backgroundPool)
+
+    def _onRevalidated(self, changes: _Changes) -> None:
+        self._revalidating = False
+        self._indexerGeneration = changes.indexerGeneration
+        if self._indexer is not None and changes.indexerGeneration is None:
+            # The indexer failed, do not scan every directory at every poll.
+            self._indexerTimer.stop()
+        if changes.generation != self._generation:
+            # Refreshed in the meantime.
+            return
+        if changes.found is None and not changes.added and not changes.removed:
+            # The indexer saw no change.
+            self.revalidated.emit()
+            return
+        if changes.removed:
+            # As in `deleteSelected()`, moving off a removed row must not
+            # mark the next one read.
+            row = self.currentRow()
+            self._selectionModel.reset()
+            self._model.removeFilenames(changes.removed)
+            self.rowSelectRequested.emit(min(row, self.rowCount() - 1))
+        self._model.addElogs(changes.added, settings=self._stateStore)
+        if self.currentRow() == -1:
+            self.rowSelectRequested.emit(0)
+        if changes.found is not None:
+            self._stateStore.prune(changes.found)
+        self._stateStore.flush()
+        self._sort()
+        self.updateStatus()
+        self.updateUnreadCount()
+        self.revalidated.emit()
 
     def saveSettings(self) -> None:
-        self._model.save(StateStore(self.settings))
+        if not self._saveTimer.isActive():
+            self._saveTimer.start()
+
+    def flushSettings(self) -> None:
+        self._saveTimer.stop()
+        self._model.save(self._stateStore)
+        self._stateStore.flush()
+
+    def requestDiff(self, item: ElogModelItem) -> None:
+        """Compare `item` with the previous elog of its package.
+
+        The files are read and compared on a worker thread, then
+        `diffReady` is emitted.
+        """
+        previous = self._model.history().previous(item)
+        self.throttle.pauseFor(_PREVIEW_PAUSE)
+
+        def diff() -> tuple[ElogModelItem, str]:
+            if previous is None:
+                return item, "<p>No previous elog of this package.</p>"
+            with previous.file() as f:
+                previousText = f.read()
+            with item.file() as f:
+                text = f.read()
+            header = (
+                f"<p>Changes since {previous.package()} of {previous.localeTime()}:</p>"
+            )
+            body = makeDiffHtml(previousText, text)
+            return item, header + (body or "<p>No change.</p>")
+
+        self._startTask(diff, self._onDiff)
+
+    def _onDiff(self, result: tuple[ElogModelItem, str]) -> None:
+        self.diffReady.emit(*result)
 
     def setFilterPattern(self, pattern: str) -> None:
         self._proxyModel.setFilterRegularExpression(pattern)
+        self._sort()
+
+    def _sort(self) -> None:
+        # The proxy does not sort dynamically, see `__init__()`.
         if self._proxyModel.sortColumn() != -1:
             self._proxyModel.sort(
                 self._proxyModel.sortColumn(),
@@ -88,6 +376,8 @@ class ElogviewerController(QtCore.QObject):
         current: QtCore.QModelIndex,
         previous: QtCore.QModelIndex,
     ) -> None:
+        # Let the preview read first.
+        self.throttle.pauseFor(_PREVIEW_PAUSE)
         if previous.row() != -1:
             model = self._model
             index = model.index(
@@ -112,82 +402,201 @@ class ElogviewerController(QtCore.QObject):
     def rowCount(self) -> int:
         return self._proxyModel.rowCount()
 
+    def setGroupedSelection(
+        self, selectionModel: QtCore.QItemSelectionModel | None
+    ) -> None:
+        """Act on the elogs selected in a `GroupModel`, or in the table if None."""
+        self._groupedSelection = selectionModel
+
+    def _selectedGroupedItems(
+        self, selectionModel: QtCore.QItemSelectionModel
+    ) -> list[ElogModelItem]:
+        items: list[ElogModelItem] = []
+        for index in selectionModel.selectedRows():
+            groupIndex = sourceIndex(index)
+            groupModel = groupIndex.model()
+            assert isinstance(groupModel, GroupModel)
+            item = groupModel.itemFromIndex(groupIndex)
+            group = groupModel.groupFromIndex(groupIndex)
+            if item is not None:
+                items.append(item)
+            elif group is not None:
+                # A package stands for all its elogs.
+                items.extend(group.items())
+        return items
+
+    def _selectedSourceRows(self) -> set[int]:
+        if self._groupedSelection is not None:
+            items = set(self._selectedGroupedItems(self._groupedSelection))
+            return {
+                row for row, item in enumerate(self._model.items()) if item in items
+            }
+        # Map one column per selected range so that Qt does not map every
+        # selected cell of the row to the source model.
+        proxyModel = self._proxyModel
+        proxySelection = QtCore.QItemSelection()
+        for selectionRange in self._selectionModel.selection():
+            proxySelection.select(
+                proxyModel.index(selectionRange.top(), 0),
+                proxyModel.index(selectionRange.bottom(), 0),
+            )
+        return {
+            row
+            for selectionRange in proxyModel.mapSelectionToSource(proxySelection)
+            for row in range(selectionRange.top(), selectionRange.bottom() + 1)
+        }
+
     def setSelectedReadState(self, state: Qt.CheckState) -> None:
-        rows = self._selectionModel.selectedRows(Column.ReadState)
+        rows = self._selectedSourceRows()
         if not rows:
             return
-        model = self._model
-        model.blockSignals(True)
-        try:
-            for index in rows:
-                model.setReadState(sourceIndex(index), state)
-        finally:
-            model.blockSignals(False)
-        model.dataChanged.emit(
-            model.index(0, 0),
-            model.index(model.rowCount() - 1, model.columnCount() - 1),
-        )
+        self._model.setReadStates(rows, state)
         self.updateUnreadCount()
 
     def toggleSelectedImportantState(self) -> None:
-        rows = self._selectionModel.selectedRows(Column.ImportantState)
-        if not rows:
+        if self._groupedSelection is not None:
+            items = self._selectedGroupedItems(self._groupedSelection)
+            if not items:
+                return
+            self._model.setImportantStates(
+                self._selectedSourceRows(),
+                Qt.CheckState.Unchecked
+                if items[0].isImportantState()
+                else Qt.CheckState.Checked,
+            )
+            return
+        selection = self._selectionModel.selection()
+        if selection.isEmpty():
             return
         model = self._model
-        firstSourceIndex = sourceIndex(rows[0])
+        first = self._proxyModel.index(selection[0].top(), Column.ImportantState)
         state = (
             Qt.CheckState.Unchecked
-            if model.importantState(firstSourceIndex) is Qt.CheckState.Checked
+            if model.importantState(sourceIndex(first)) is Qt.CheckState.Checked
             else Qt.CheckState.Checked
         )
-        model.blockSignals(True)
-        try:
-            for index in rows:
-                model.setImportantState(sourceIndex(index), state)
-        finally:
-            model.blockSignals(False)
-        model.dataChanged.emit(
-            model.index(0, Column.ImportantState),
-            model.index(model.rowCount() - 1, Column.ImportantState),
-        )
+        model.setImportantStates(self._selectedSourceRows(), state)
+
+    def _startTask(
+        self,
+        fn: Callable[[], object],
+        slot: Callable[..., None],
+        *,
+        pool: QtCore.QThreadPool | None = None,
+    ) -> None:
+        task = _Task(fn, background=pool is self._backgroundPool)
+        self._tasks.add(task)
+        task.signals.finished.connect(slot)
+
+        def forget(_result: object) -> None:
+            self._tasks.discard(task)
+
+        task.signals.finished.connect(forget)
+        if pool is None:
+            pool = QtCore.QThreadPool.globalInstance()
+            assert pool is not None
+        pool.start(task)
 
     def deleteSelected(self) -> None:
-        selection = [
-            self._proxyModel.mapToSource(idx)
-            for idx in self._selectionModel.selectedRows()
-        ]
-        selection.sort(key=lambda idx: idx.row())
+        model = self._model
+        filenames = [model.item(row).filename() for row in self._selectedSourceRows()]
         # Avoid call to onCurrentRowChanged() by clearing
         # selection with reset().
-        currentRow = self.currentRow()
+        self._rowBeforeDelete = self.currentRow()
         self._selectionModel.reset()
+        if self._groupedSelection is not None:
+            self._groupedSelection.reset()
+        if not filenames:
+            self._onDeleted((frozenset(), ()))
+            return
+        self._startTask(lambda: _unlink(filenames), self._onDeleted)
 
-        filename: Path | None = None
-        try:
-            for index in reversed(selection):
-                filename = self._model.itemFromIndex(index).filename()
-                if filename.exists():
-                    filename.unlink()
-                self._model.removeRow(index.row())
-        except OSError as exc:
-            self.errorOccurred.emit(
-                f"Error while trying to delete '{filename}':<br><b>{exc.strerror}</b>",
-            )
+    def _onDeleted(
+        self,
+        result: tuple[frozenset[Path], Sequence[tuple[Path, str]]],
+    ) -> None:
+        deleted, errors = result
+        if deleted:
+            self._model.removeFilenames(deleted)
+            self.saveSettings()
+        if errors:
+            self.errorOccurred.emit(_errorMessage("delete", errors))
+        self.rowSelectRequested.emit(min(self._rowBeforeDelete, self.rowCount() - 1))
+        self.updateStatus()
+        self.deleteFinished.emit()
 
-        self.rowSelectRequested.emit(min(currentRow, self.rowCount() - 1))
+    def compressOldElogs(self, *, olderThanDays: float, ext: str) -> None:
+        sources = self.config.sources
+        throttle = self.throttle
+        self._startTask(
+            # Scanning large directories would block the window.
+            lambda: compressOld(
+                scanSources(sources),
+                ext,
+                olderThanDays=olderThanDays,
+                throttle=throttle,
+            ),
+            self._onCompressed,
+            pool=self._backgroundPool,
+        )
+
+    def _onCompressed(
+        self,
+        result: tuple[Mapping[Path, Path], Sequence[tuple[Path, str]]],
+    ) -> None:
+        renamed, errors = result
+        if renamed:
+            self._stateStore.rename(renamed)
+            self._model.renameFilenames(renamed)
+        if errors:
+            self.errorOccurred.emit(_errorMessage("compress", errors))
+        self.compressFinished.emit()
+
+    def expiredElogs(self, policy: RetentionPolicy) -> Sequence[ElogModelItem]:
+        """The elogs that `policy` would delete."""
+        return policy.expired(self._model.history())
+
+    def prune(self, items: Sequence[ElogModelItem]) -> None:
+        """Delete `items`, found by `expiredElogs()`, in one background job."""
+        filenames = [item.filename() for item in items]
+        if not filenames:
+            self._onPruned((frozenset(), ()))
+            return
+        self._startTask(
+            lambda: _unlink(filenames), self._onPruned, pool=self._backgroundPool
+        )
+
+    def _onPruned(
+        self,
+        result: tuple[frozenset[Path], Sequence[tuple[Path, str]]],
+    ) -> None:
+        deleted, errors = result
+        if deleted:
+            # As in `deleteSelected()`, moving off a removed row must not
+            # mark the next one read.
+            row = self.currentRow()
+            self._selectionModel.reset()
+            self._model.removeFilenames(deleted)
+            self.rowSelectRequested.emit(min(row, self.rowCount() - 1))
+            self.saveSettings()
+        if errors:
+            self.errorOccurred.emit(_errorMessage("delete", errors))
         self.updateStatus()
+        self.updateUnreadCount()
+        self.pruneFinished.emit()
 
     def populate(self) -> None:
+        self._generation += 1
+        if self._saveTimer.isActive():
+            self.flushSettings()
         currentRow = self.currentRow()
         self._selectionModel.reset()
+        filenames = scanSources(self.config.sources)
         self._model.populate(
-            (
-                Path(f)
-                for f in itertools.chain(
-                    glob.iglob(str(self.config.elogpath / "*:*:*.log*")),
-                    glob.iglob(str(self.config.elogpath / "*" / "*:*.log*")),
-                )
-            ),
-            settings=StateStore(self.settings),
+            filenames,
+            settings=self._stateStore,
+            pageSize=_PAGE_SIZE if len(filenames) > _LAZY_POPULATE_THRESHOLD else 0,
+            sources=self.config.sources,
         )
+        self._stateStore.flush()
         self.rowSelectRequested.emit(min(currentRow, self.rowCount() - 1))
@@ -1,25 +1,35 @@
 # SPDX-License-Identifier: GPL-2.0-only
 
 import enum
-from collections.abc import Iterable
+import functools
+import logging
+from collections.abc import Collection, Container, Iterable, Iterator, Mapping, Sequence
 from pathlib import Path
 from typing import Final, override
 
-from PyQt6 import QtCore
+from PyQt6 import QtCore, QtGui
 
-from .elog import Elog
+from .eclass import EClass, eclassColor
+from .elog import Elog, loadElogs, sourceOf
 from .model import (
     IMPORTANT,
     READ,
     UNIMPORTANT,
     UNREAD,
     Column,
+    DateIndex,
+    ElogGroup,
     ElogModelItem,
+    PackageHistory,
     StateStore,
 )
 
+_LOGGER = logging.getLogger("elogviewer")
+
 Qt = QtCore.Qt
 _MODEL_INDEX: Final = QtCore.QModelIndex()
+_MAX_REMOVED_RANGES: Final = 64
+_CHECK_STATES: Final = (Qt.CheckState.Unchecked, Qt.CheckState.Checked)
 
 
 def sourceIndex(index: QtCore.QModelIndex) -> QtCore.QModelIndex:
@@ -29,14 +39,110 @@ def sourceIndex(index: QtCore.QModelIndex) -> QtCore.QModelIndex:
     return model.mapToSource(index)  # pyright: ignore[reportAttributeAccessIssue, reportUnknownVariableType]
 
 
+def rowRanges(rows: Iterable[int]) -> Iterator[tuple[int, int]]:
+    """Coalesce `rows` into sorted and inclusive `(first, last)` ranges."""
+    first = last = -1
+    for row in sorted(set(rows)):
+        if first == -1:
+            first = last = row
+        elif row == last + 1:
+            last = row
+        else:
+            yield first, last
+            first = last = row
+    if first != -1:
+        yield first, last
+
+
 class Role(enum.IntEnum):
     SortRole = Qt.ItemDataRole.UserRole + 1
 
 
+# The font and the brushes are shared by all the rows and only built
+# once the application exists.
+@functools.cache
+def _unreadFont() -> QtGui.QFont:
+    font = QtGui.QFont()
+    font.setBold(True)
+    return font
+
+
+@functools.cache
+def _eclassBrush(eclass: EClass) -> QtGui.QBrush:
+    return QtGui.QBrush(QtGui.QColor(*eclassColor(eclass)))
+
+
+def _itemData(item: ElogModelItem, column: int, role: int) -> object:
+    if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.EditRole:
+        return item.displayText(column)
+    if role == Qt.ItemDataRole.FontRole:
+        return None if item.isReadState() else _unreadFont()
+    if role == Qt.ItemDataRole.ForegroundRole:
+        return _eclassBrush(item.eclass()) if column == Column.Eclass else None
+    if role == Qt.ItemDataRole.CheckStateRole:
+        if column == Column.ImportantState:
+            return _CHECK_STATES[item.isImportantState()]
+        if column == Column.ReadState:
+            return _CHECK_STATES[item.isReadState()]
+        return None
+    if role == Role.SortRole:
+        return item.sortKey(column)
+    return None
+
+
+def _groupData(group: ElogGroup, column: int, role: int) -> object:
+    latest = group.latest()
+    if role == Qt.ItemDataRole.DisplayRole:
+        return {
+            Column.Category: group.category,
+            Column.Package: f"{group.name} ({group.count()})",
+            Column.ReadState: str(group.unreadCount() or ""),
+            Column.Eclass: group.worstEclass().name,
+            Column.Date: latest.displayText(Column.Date) if latest else "",
+        }.get(Column(column), "")
+    if role == Role.SortRole:
+        return {
+            Column.Category: f"{group.category.lower()}/{group.name.lower()}",
+            Column.Package: f"{group.name.lower()}",
+            Column.ReadState: f"{group.unreadCount():09d}",
+            Column.Eclass: group.worstEclass().value,
+            Column.Date: latest.sortKey(Column.Date) if latest else "",
+        }.get(Column(column), "")
+    if role == Qt.ItemDataRole.ForegroundRole:
+        return _eclassBrush(group.worstEclass()) if column == Column.Eclass else None
+    if role == Qt.ItemDataRole.ToolTipRole:
+        return f"{group.count()} elogs, {group.unreadCount()} unread"
+    return None
+
+
 class Model(QtCore.QAbstractTableModel):
+    # Emitted once per user operation on the read or important states,
+    # however many rows the operation touched.
+    statesChanged = QtCore.pyqtSignal()
+
     def __init__(self, parent: QtCore.QObject | None = None) -> None:
         super().__init__(parent)
         self._data: list[ElogModelItem] = []  # A list of ElogModelItem.
+        # The elogs not fetched yet, newest last, and their states.
+        self._pending: list[Path] = []
+        self._pendingRead: set[Path] = set()
+        self._pendingImportant: set[Path] = set()
+        # The states changed since the last `save()`.
+        self._readChanges: dict[Path, bool] = {}
+        self._importantChanges: dict[Path, bool] = {}
+        self._pageSize = 0
+        self._sources: Mapping[Path, str] = {}
+        # The elogs by digest and the newest of each, see `_duplicates()`.
+        self._byDigest: dict[str, list[ElogModelItem]] | None = None
+        self._newestByDigest: dict[str, ElogModelItem] = {}
+        self._removedDigests: set[str] = set()
+        # Built on first use and dropped when rows come and go.
+        self._history: PackageHistory | None = None
+        self._dateIndex: DateIndex | None = None
+        self.rowsInserted.connect(self._onRowsInserted)
+        self.rowsAboutToBeRemoved.connect(self._onRowsAboutToBeRemoved)
+        self.rowsRemoved.connect(self._onRowsRemoved)
+        self.modelReset.connect(self._onModelReset)
 
     def importantState(self, index: QtCore.QModelIndex) -> Qt.CheckState:
         return (
@@ -52,12 +158,27 @@ class Model(QtCore.QAbstractTableModel):
     ) -> bool:
         if index.column() != Column.ImportantState:
             return False
-        self.itemFromIndex(index).setImportantState(
+        item = self.itemFromIndex(index)
+        item.setImportantState(
             IMPORTANT if state is Qt.CheckState.Checked else UNIMPORTANT
         )
+        self._importantChanges[item.filename()] = item.isImportantState()
         self.dataChanged.emit(index, index)
+        self.statesChanged.emit()
         return True
 
+    def setImportantStates(self, rows: Iterable[int], state: Qt.CheckState) -> None:
+        importantState = IMPORTANT if state is Qt.CheckState.Checked else UNIMPORTANT
+        for first, last in rowRanges(rows):
+            for item in self._data[first : last + 1]:
+                item.setImportantState(importantState)
+                self._importantChanges[item.filename()] = item.isImportantState()
+            self.dataChanged.emit(
+                self.index(first, Column.ImportantState),
+                self.index(last, Column.ImportantState),
+            )
+        self.statesChanged.emit()
+
     def readState(self, index: QtCore.QModelIndex) -> Qt.CheckState:
         return (
             Qt.CheckState.Checked
@@ -68,21 +189,37 @@ class Model(QtCore.QAbstractTableModel):
     def setReadState(self, index: QtCore.QModelIndex, state: Qt.CheckState) -> bool:
         if index.column() != Column.ReadState:
             return False
-        self.itemFromIndex(index).setReadState(
-            READ if state is Qt.CheckState.Checked else UNREAD
-        )
+        item = self.itemFromIndex(index)
+        item.setReadState(READ if state is Qt.CheckState.Checked else UNREAD)
+        self._readChanges[item.filename()] = item.isReadState()
         self.dataChanged.emit(
             self.index(index.row(), 0, index.parent()),
             self.index(index.row(), self.columnCount() - 1, index.parent()),
         )
+        self.statesChanged.emit()
         return True
 
+    def setReadStates(self, rows: Iterable[int], state: Qt.CheckState) -> None:
+        readState = READ if state is Qt.CheckState.Checked else UNREAD
+        for first, last in rowRanges(rows):
+            for item in self._data[first : last + 1]:
+                item.setReadState(readState)
+                self._readChanges[item.filename()] = item.isReadState()
+            self.dataChanged.emit(
+                self.index(first, 0),
+                self.index(last, self.columnCount() - 1),
+            )
+        self.statesChanged.emit()
+
     def itemFromIndex(self, index: QtCore.QModelIndex) -> ElogModelItem:
         return self._data[index.row()]
 
     def item(self, row: int, _column: int = 0) -> ElogModelItem:
         return self._data[row]
 
+    def rowOfItem(self, item: ElogModelItem) -> int:
+        return self._data.index(item)
+
     def appendItem(self, item: ElogModelItem) -> None:
         self._data.append(item)
 
@@ -90,11 +227,101 @@ class Model(QtCore.QAbstractTableModel):
     def rowCount(self, parent: QtCore.QModelIndex = _MODEL_INDEX) -> int:
         return len(self._data)
 
+    def _duplicates(self) -> dict[str, list[ElogModelItem]]:
+        if self._byDigest is None:
+            self._byDigest = {}
+            for item in self._data:
+                if item.digest():
+                    self._byDigest.setdefault(item.digest(), []).append(item)
+            self._newestByDigest = {
+                digest: max(items, key=lambda item: item.sortKey(Column.Date))
+                for digest, items in self._byDigest.items()
+            }
+        return self._byDigest
+
+    def _digests(self, first: int, last: int) -> set[str]:
+        return {item.digest() for item in self._data[first : last + 1]} - {""}
+
+    def _onRowsInserted(
+        self, _parent: QtCore.QModelIndex, first: int, last: int
+    ) -> None:
+        self._byDigest = None
+        self._history = None
+        self._dateIndex = None
+        # The views and proxies may not know the inserted rows yet.
+        self._emitDuplicatesChanged(
+            self._digests(first, last), skipped=range(first, last + 1)
+        )
+
+    def _onRowsAboutToBeRemoved(
+        self, _parent: QtCore.QModelIndex, first: int, last: int
+    ) -> None:
+        self._removedDigests = self._digests(first, last)
+
+    def _onRowsRemoved(self) -> None:
+        self._byDigest = None
+        self._history = None
+        self._dateIndex = None
+        self._emitDuplicatesChanged(self._removedDigests)
+        self._removedDigests = set()
+
+    def _onModelReset(self) -> None:
+        self._byDigest = None
+        self._history = None
+        self._dateIndex = None
+
+    def history(self) -> PackageHistory:
+        if self._history is None:
+            self._history = PackageHistory(self._data)
+        return self._history
+
+    def dateIndex(self) -> DateIndex:
+        if self._dateIndex is None:
+            self._dateIndex = DateIndex(self._data)
+        return self._dateIndex
+
+    def _emitDuplicatesChanged(
+        self, digests: Collection[str], *, skipped: Container[int] = ()
+    ) -> None:
+        """Repaint the count of the elogs identical to the ones changed.
+
+        The rows in `skipped` are left out.
+        """
+        if not digests:
+            return
+        rows = (
+            row
+            for row, item in enumerate(self._data)
+            if item.digest() in digests and row not in skipped
+        )
+        for first, last in rowRanges(rows):
+            self.dataChanged.emit(
+                self.index(first, Column.Duplicates),
+                self.index(last, Column.Duplicates),
+            )
+
+    def duplicateCount(self, item: ElogModelItem) -> int:
+        """The number of elogs identical to `item`, itself included."""
+        return len(self._duplicates().get(item.digest(), (item,)))
+
+    def isRepeat(self, item: ElogModelItem) -> bool:
+        """Whether a newer elog is identical to `item`."""
+        self._duplicates()
+        return self._newestByDigest.get(item.digest(), item) is not item
+
+    def duplicatesData(self, item: ElogModelItem, role: int) -> object:
+        count = self.duplicateCount(item)
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(count) if count > 1 else ""
+        if role == Role.SortRole:
+            return f"{count:09d}{item.sortKey(Column.Date)}"
+        return _itemData(item, Column.Duplicates, role)
+
     def elogCount(self) -> int:
-        return self.rowCount()
+        return self.rowCount() + len(self._pending)
 
     def readCount(self) -> int:
-        count = 0
+        count = len(self._pendingRead)
         for row in range(self.rowCount()):
             if self.item(row).isReadState():
                 count += 1
@@ -104,7 +331,7 @@ class Model(QtCore.QAbstractTableModel):
         return self.elogCount() - self.readCount()
 
     def importantCount(self) -> int:
-        count = 0
+        count = len(self._pendingImportant)
         for row in range(self.rowCount()):
             if self.item(row).isImportantState():
                 count += 1
@@ -122,12 +349,61 @@ class Model(QtCore.QAbstractTableModel):
         parent: QtCore.QModelIndex = _MODEL_INDEX,
     ) -> bool:
         last = min(self.rowCount(), row + count)
-        self.beginRemoveRows(parent, row, max(row, last - 1))
-        idx = -1
-        for idx in range(row, row + count):
-            del self._data[row]
+        if last <= row:
+            return False
+        self.beginRemoveRows(parent, row, last - 1)
+        del self._data[row:last]
         self.endRemoveRows()
-        return idx > -1
+        return True
+
+    def removeFilenames(self, filenames: Collection[Path]) -> None:
+        rows = [
+            row for row, item in enumerate(self._data) if item.filename() in filenames
+        ]
+        for row in rows:
+            # Forget the states of the removed elogs.
+            item = self._data[row]
+            if item.isReadState():
+                self._readChanges[item.filename()] = False
+            if item.isImportantState():
+                self._importantChanges[item.filename()] = False
+        ranges = list(rowRanges(rows))
+        if self._pending:
+            self._removePending(filenames)
+        if len(ranges) > _MAX_REMOVED_RANGES:
+            # Every removal shifts the rows below it.  Rebuild the list at
+            # once instead when the rows are scattered.
+            self.beginResetModel()
+            self._data = [
+                item for item in self._data if item.filename() not in filenames
+            ]
+            self.endResetModel()
+            return
+        for first, last in reversed(ranges):
+            self.removeRows(first, last - first + 1)
+
+    def _removePending(self, filenames: Collection[Path]) -> None:
+        for filename in self._pendingRead.intersection(filenames):
+            self._readChanges[filename] = False
+        for filename in self._pendingImportant.intersection(filenames):
+            self._importantChanges[filename] = False
+        self._pending = [f for f in self._pending if f not in filenames]
+        self._pendingRead.difference_update(filenames)
+        self._pendingImportant.difference_update(filenames)
+
+    def renameFilenames(self, renamed: Mapping[Path, Path]) -> None:
+        for item in self._data:
+            newName = renamed.get(item.filename())
+            if newName is not None:
+                item.setFilename(newName)
+        self._pending = [renamed.get(f, f) for f in self._pending]
+        self._pendingRead = {renamed.get(f, f) for f in self._pendingRead}
+        self._pendingImportant = {renamed.get(f, f) for f in self._pendingImportant}
+        self._readChanges = {renamed.get(f, f): v for f, v in self._readChanges.items()}
+        self._importantChanges = {
+            renamed.get(f, f): v for f, v in self._importantChanges.items()
+        }
+        self.statesChanged.emit()
 
     @override
     def headerData(
@@ -155,59 +431,145 @@ class Model(QtCore.QAbstractTableModel):
         return super().flags(index)
 
     def save(self, settings: StateStore) -> None:
-        settings.saveRead(
-            frozenset(item.filename() for item in self._data if item.isReadState())
-        )
-        settings.saveImportant(
-            frozenset(item.filename() for item in self._data if item.isImportantState())
-        )
+        """Pass the states changed since the last call to `settings`."""
+        if self._readChanges:
+            settings.setRead(self._readChanges)
+            self._readChanges = {}
+        if self._importantChanges:
+            settings.setImportant(self._importantChanges)
+            self._importantChanges = {}
+
+    def populate(
+        self,
+        filenames: Iterable[Path],
+        *,
+        settings: StateStore,
+        pageSize: int = 0,
+        sources: Mapping[Path, str] | None = None,
+    ) -> None:
+        """Load the elogs in `filenames`.
 
-    def populate(self, filenames: Iterable[Path], *, settings: StateStore) -> None:
+        With a `pageSize`, only load the newest elogs and let the views
+        fetch the older ones page by page.  `sources` names the elog
+        directories for the Source column.
+        """
         self.removeRows(0, self.rowCount())
         self.beginResetModel()
+        found = list(filenames)
         readNames = settings.loadRead()
         importantNames = settings.loadImportant()
-        for filename in filenames:
-            item = ElogModelItem(Elog.fromFilename(filename))
-            item.setReadState(READ if filename in readNames else UNREAD)
-            item.setImportantState(
-                IMPORTANT if filename in importantNames else UNIMPORTANT
-            )
-            self.appendItem(item)
+        self._pageSize = pageSize
+        self._sources = {} if sources is None else sources
+        if pageSize and len(found) > pageSize:
+            self._pending = sorted(found, key=Elog.dateKey)
+            self._pendingRead = {f for f in self._pending if f in readNames}
+            self._pendingImportant = {f for f in self._pending if f in importantNames}
+            self._data = self._fetchPage()
+        else:
+            self._pending = []
+            self._pendingRead = set()
+            self._pendingImportant = set()
+            for elog in loadElogs(found, self._sources):
+                filename = elog.filename
+                item = ElogModelItem(elog)
+                item.setReadState(READ if filename in readNames else UNREAD)
+                item.setImportantState(
+                    IMPORTANT if filename in importantNames else UNIMPORTANT
+                )
+                self.appendItem(item)
+        self.endResetModel()
+        settings.prune(found)
+
+    def items(self) -> Sequence[ElogModelItem]:
+        return self._data
+
+    def filenames(self) -> list[Path]:
+        """The filenames of the elogs, including the ones not fetched yet."""
+        return [item.filename() for item in self._data] + self._pending
+
+    def restore(
+        self,
+        items: Iterable[ElogModelItem],
+        *,
+        sources: Mapping[Path, str] | None = None,
+    ) -> None:
+        """Show `items` saved earlier, without reading the elogs."""
+        self.beginResetModel()
+        self._data = list(items)
+        self._pending = []
+        self._pendingRead = set()
+        self._pendingImportant = set()
+        self._sources = {} if sources is None else sources
         self.endResetModel()
 
+    def addElogs(self, elogs: Iterable[Elog], *, settings: StateStore) -> None:
+        readNames = settings.loadRead()
+        importantNames = settings.loadImportant()
+        items = [
+            ElogModelItem(
+                elog,
+                READ if elog.filename in readNames else UNREAD,
+                IMPORTANT if elog.filename in importantNames else UNIMPORTANT,
+            )
+            for elog in elogs
+        ]
+        if not items:
+            return
+        first = self.rowCount()
+        self.beginInsertRows(_MODEL_INDEX, first, first + len(items) - 1)
+        self._data.extend(items)
+        self.endInsertRows()
+
+    def _fetchPage(self) -> list[ElogModelItem]:
+        """Load the next `_pageSize` elogs in `_pending`, newest first."""
+        items: list[ElogModelItem] = []
+        while self._pending and len(items) < self._pageSize:
+            item = self._fetchItem()
+            if item is not None:
+                items.append(item)
+        return items
+
+    def _fetchItem(self) -> ElogModelItem | None:
+        filename = self._pending.pop()
+        try:
+            elog = Elog.fromFilename(filename, source=sourceOf(filename, self._sources))
+        except ValueError:
+            _LOGGER.error("%s: not an elog name", filename)
+            return None
+        item = ElogModelItem(elog)
+        if filename in self._pendingRead:
+            self._pendingRead.remove(filename)
+            item.setReadState(READ)
+        if filename in self._pendingImportant:
+            self._pendingImportant.remove(filename)
+            item.setImportantState(IMPORTANT)
+        return item
+
+    @override
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        return not parent.isValid() and bool(self._pending)
+
+    @override
+    def fetchMore(self, parent: QtCore.QModelIndex) -> None:
+        if parent.isValid() or not self._pending:
+            return
+        items = self._fetchPage()
+        if not items:
+            return
+        first = self.rowCount()
+        self.beginInsertRows(parent, first, first + len(items) - 1)
+        self._data.extend(items)
+        self.endInsertRows()
+
     @override
     def data(
         self,
         index: QtCore.QModelIndex,
         role: int = Qt.ItemDataRole.DisplayRole,
     ) -> object:
-        item = self._data[index.row()]
-        col = Column(index.column())
-        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
-            return {
-                Column.Category: item.category(),
-                Column.Package: item.package(),
-                Column.Eclass: item.eclass().name,
-                Column.Date: item.localeTime(),
-            }.get(col, "")
-        if role == Qt.ItemDataRole.CheckStateRole:
-            checkState = {
-                Column.ImportantState: self.importantState,
-                Column.ReadState: self.readState,
-            }.get(col)
-            return checkState(index) if checkState else None
-        if role == Role.SortRole:
-            key = {
-                Column.ImportantState: item.isImportantState,
-                Column.ReadState: item.isReadState,
-                Column.Date: item.isoTime,
-                Column.Eclass: lambda: item.eclass().value,
-                Column.Category: item.category().lower,
-                Column.Package: item.package().lower,
-            }.get(col, lambda: self.data(index, Qt.ItemDataRole.DisplayRole))()
-            return f"{key}{item.isoTime()}"
-        return None
+        if index.column() == Column.Duplicates:
+            return self.duplicatesData(self._data[index.row()], role)
+        return _itemData(self._data[index.row()], index.column(), role)
 
     @override
     def setData(
@@ -227,3 +589,306 @@ class Model(QtCore.QAbstractTableModel):
             }[col](index, state)
         except (KeyError, ValueError):
             return False
+
+
+class ElogFilterProxyModel(QtCore.QSortFilterProxyModel):
+    """Filter the rows of a `Model` by date and optionally hide the repeats."""
+
+    def __init__(self, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self._collapseDuplicates = False
+        self._dateRange: tuple[float, float] | None = None
+        # The elogs in `_dateRange`, looked up in the date index.
+        self._inDateRange: frozenset[ElogModelItem] = frozenset()
+
+    def dateRange(self) -> tuple[float, float] | None:
+        return self._dateRange
+
+    def setDateRange(self, dateRange: tuple[float, float] | None) -> None:
+        """Only show the elogs logged in `dateRange`, or all if None."""
+        self._dateRange = dateRange
+        self._updateDateRange()
+        self.invalidateRowsFilter()
+
+    def _updateDateRange(self) -> None:
+        model = self.sourceModel()
+        if self._dateRange is None or not isinstance(model, Model):
+            self._inDateRange = frozenset()
+        else:
+            self._inDateRange = frozenset(model.dateIndex().between(*self._dateRange))
+
+    def collapseDuplicates(self) -> bool:
+        return self._collapseDuplicates
+
+    def setCollapseDuplicates(self, collapse: bool) -> None:
+        """Only show the newest of the identical elogs if `collapse`."""
+        self._collapseDuplicates = collapse
+        self.invalidateRowsFilter()
+
+    @override
+    def setSourceModel(self, sourceModel: QtCore.QAbstractItemModel | None) -> None:
+        assert isinstance(sourceModel, Model)
+        super().setSourceModel(sourceModel)
+        # A new elog may hide an older one, and removing it show it again.
+        sourceModel.rowsInserted.connect(self._onRowsChanged)
+        sourceModel.rowsRemoved.connect(self._onRowsChanged)
+        sourceModel.modelReset.connect(self._onRowsChanged)
+
+    def _onRowsChanged(self) -> None:
+        if self._dateRange is not None:
+            self._updateDateRange()
+        if self._collapseDuplicates or self._dateRange is not None:
+            self.invalidateRowsFilter()
+
+    @override
+    def filterAcceptsRow(
+        self, source_row: int, source_parent: QtCore.QModelIndex
+    ) -> bool:
+        model = self.sourceModel()
+        assert isinstance(model, Model)
+        item = model.item(source_row)
+        if self._dateRange is not None and item not in self._inDateRange:
+            return False
+        if self._collapseDuplicates and model.isRepeat(item):
+            return False
+        return super().filterAcceptsRow(source_row, source_parent)
+
+
+class GroupModel(QtCore.QAbstractItemModel):
+    """Show the rows of a `Model` grouped by package.
+
+    The groups are the top-level rows and the elogs their children.  They
+    follow the insertions, removals and state changes of the source model
+    without regrouping everything.
+    """
+
+    def __init__(self, source: Model, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self._source = source
+        self._groups: list[ElogGroup] = []
+        self._groupByKey: dict[tuple[str, str], ElogGroup] = {}
+        self._groupRows: dict[ElogGroup, int] = {}
+        self._regroup()
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self._onModelReset)
+        source.rowsInserted.connect(self._onRowsInserted)
+        source.rowsAboutToBeRemoved.connect(self._onRowsAboutToBeRemoved)
+        source.dataChanged.connect(self._onDataChanged)
+
+    def sourceModel(self) -> Model:
+        return self._source
+
+    def groupFromIndex(self, index: QtCore.QModelIndex) -> ElogGroup | None:
+        """The group at `index` or None if `index` is an elog."""
+        if not index.isValid() or index.internalPointer() is not None:
+            return None
+        return self._groups[index.row()]
+
+    def itemFromIndex(self, index: QtCore.QModelIndex) -> ElogModelItem | None:
+        """The elog at `index` or None if `index` is a group."""
+        group = index.internalPointer() if index.isValid() else None
+        if not isinstance(group, ElogGroup):
+            return None
+        return group.items()[index.row()]
+
+    def _regroup(self) -> None:
+        self._groups = []
+        self._groupByKey = {}
+        for row in range(self._source.rowCount()):
+            item = self._source.item(row)
+            group = self._groupByKey.get(ElogGroup.key(item))
+            if group is None:
+                group = self._groupByKey[ElogGroup.key(item)] = ElogGroup(
+                    *ElogGroup.key(item)
+                )
+                self._groups.append(group)
+            group.addItems((item,))
+        self._updateGroupRows()
+
+    def _updateGroupRows(self) -> None:
+        self._groupRows = {group: row for row, group in enumerate(self._groups)}
+
+    def _groupIndex(self, group: ElogGroup, column: int = 0) -> QtCore.QModelIndex:
+        return self.createIndex(self._groupRows[group], column, None)
+
+    def _onModelReset(self) -> None:
+        self._regroup()
+        self.endResetModel()
+
+    def _itemsByGroup(
+        self, first: int, last: int
+    ) -> dict[tuple[str, str], list[ElogModelItem]]:
+        itemsByGroup: dict[tuple[str, str], list[ElogModelItem]] = {}
+        for row in range(first, last + 1):
+            item = self._source.item(row)
+            itemsByGroup.setdefault(ElogGroup.key(item), []).append(item)
+        return itemsByGroup
+
+    def _onRowsInserted(
+        self, _parent: QtCore.QModelIndex, first: int, last: int
+    ) -> None:
+        newGroups: list[ElogGroup] = []
+        for key, items in self._itemsByGroup(first, last).items():
+            group = self._groupByKey.get(key)
+            if group is None:
+                group = self._groupByKey[key] = ElogGroup(*key)
+                group.addItems(items)
+                newGroups.append(group)
+                continue
+            count = group.count()
+            self.beginInsertRows(self._groupIndex(group), count, count + len(items) - 1)
+            group.addItems(items)
+            self.endInsertRows()
+            self._emitGroupChanged(group)
+        if newGroups:
+            count = len(self._groups)
+            self.beginInsertRows(_MODEL_INDEX, count, count + len(newGroups) - 1)
+            self._groups.extend(newGroups)
+            self._updateGroupRows()
+            self.endInsertRows()
+
+    def _onRowsAboutToBeRemoved(
+        self, _parent: QtCore.QModelIndex, first: int, last: int
+    ) -> None:
+        if first == 0 and last == self._source.rowCount() - 1:
+            self.beginResetModel()
+            self._groups, self._groupByKey, self._groupRows = [], {}, {}
+            self.endResetModel()
+            return
+        emptyGroups: list[ElogGroup] = []
+        for key, items in self._itemsByGroup(first, last).items():
+            group = self._groupByKey[key]
+            removed = set(items)
+            rows = (row for row, item in enumerate(group.items()) if item in removed)
+            for rangeFirst, rangeLast in reversed(list(rowRanges(rows))):
+                self.beginRemoveRows(self._groupIndex(group), rangeFirst, rangeLast)
+                group.removeItems(rangeFirst, rangeLast)
+                self.endRemoveRows()
+            if group.count():
+                self._emitGroupChanged(group)
+            else:
+                emptyGroups.append(group)
+        for group in emptyGroups:
+            row = self._groupRows[group]
+            self.beginRemoveRows(_MODEL_INDEX, row, row)
+            del self._groups[row]
+            del self._groupByKey[group.category, group.name]
+            self._updateGroupRows()
+            self.endRemoveRows()
+
+    def _onDataChanged(
+        self, topLeft: QtCore.QModelIndex, bottomRight: QtCore.QModelIndex
+    ) -> None:
+        for key, items in self._itemsByGroup(topLeft.row(), bottomRight.row()).items():
+            group = self._groupByKey.get(key)
+            if group is None:
+                # Not grouped yet, `_onRowsInserted()` adds the items.
+                continue
+            for item in items:
+                group.refresh(item)
+            changed = set(items)
+            rows = (row for row, item in enumerate(group.items()) if item in changed)
+            for first, last in rowRanges(rows):
+                self.dataChanged.emit(
+                    self.createIndex(first, topLeft.column(), group),
+                    self.createIndex(last, bottomRight.column(), group),
+                )
+            self._emitGroupChanged(group)
+
+    def _emitGroupChanged(self, group: ElogGroup) -> None:
+        self.dataChanged.emit(
+            self._groupIndex(group), self._groupIndex(group, self.columnCount() - 1)
+        )
+
+    @override
+    def index(
+        self,
+        row: int,
+        column: int,
+        parent: QtCore.QModelIndex = _MODEL_INDEX,
+    ) -> QtCore.QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, None)
+        return self.createIndex(row, column, self._groups[parent.row()])
+
+    @override
+    def parent(self, child: QtCore.QModelIndex | None = None) -> QtCore.QModelIndex:  # pyright: ignore[reportIncompatibleMethodOverride]
+        group = child.internalPointer() if child and child.isValid() else None
+        if not isinstance(group, ElogGroup) or group not in self._groupRows:
+            return QtCore.QModelIndex()
+        return self._groupIndex(group)
+
+    @override
+    def rowCount(self, parent: QtCore.QModelIndex = _MODEL_INDEX) -> int:
+        if not parent.isValid():
+            return len(self._groups)
+        group = self.groupFromIndex(parent)
+        if group is None or parent.column() != 0:
+            return 0
+        return group.count()
+
+    @override
+    def columnCount(self, parent: QtCore.QModelIndex = _MODEL_INDEX) -> int:
+        return len(Column)
+
+    @override
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> object:
+        return self._source.headerData(section, orientation, role)
+
+    @override
+    def flags(self, index: QtCore.QModelIndex) -> Qt.ItemFlag:
+        if self.itemFromIndex(index) is not None and index.column() in (
+            Column.ImportantState,
+            Column.ReadState,
+        ):
+            return super().flags(index) | Qt.ItemFlag.ItemIsUserCheckable
+        return super().flags(index)
+
+    @override
+    def data(
+        self,
+        index: QtCore.QModelIndex,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> object:
+        item = self.itemFromIndex(index)
+        if item is not None:
+            if index.column() == Column.Duplicates:
+                return self._source.duplicatesData(item, role)
+            return _itemData(item, index.column(), role)
+        group = self.groupFromIndex(index)
+        if group is None:
+            return None
+        return _groupData(group, index.column(), role)
+
+    @override
+    def setData(
+        self,
+        index: QtCore.QModelIndex,
+        value: object,
+        role: int = Qt.ItemDataRole.EditRole,
+    ) -> bool:
+        item = self.itemFromIndex(index)
+        if item is None:
+            return False
+        # Go through the source model so that it saves the states and
+        # notifies its own views.
+        source = self._source
+        return source.setData(
+            source.index(source.rowOfItem(item), index.column()), value, role
+        )
+
+    @override
+    def canFetchMore(self, parent: QtCore.QModelIndex) -> bool:
+        return not parent.isValid() and self._source.canFetchMore(parent)
+
+    @override
+    def fetchMore(self, parent: QtCore.QModelIndex) -> None:
+        if not parent.isValid():
+            self._source.fetchMore(parent)
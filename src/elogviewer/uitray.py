@@ -0,0 +1,157 @@
+# SPDX-License-Identifier: GPL-2.0-only
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Final, final
+
+from PyQt6 import QtCore, QtGui, QtWidgets
+
+from .eclass import EClass
+from .elog import Elog, scanSources, sourceOf
+from .uicontroller import Config
+
+if TYPE_CHECKING:
+    from .uiview import Elogviewer
+
+Qt = QtCore.Qt
+
+# The elogs worth a notification.
+_NOTIFIED: Final = frozenset({EClass.Error, EClass.Warning})
+# Coalesce the bursts of changes while portage writes the elogs.
+_CHECK_DELAY_MS: Final = 500
+# Number of elogs listed in a notification.
+_MAX_LISTED: Final = 5
+
+
+# Drop the suffixes so that compressing an elog does not make it new.
+
+
+def _dateKey(filename: Path) -> str:
+    return Elog.dateKey(filename)[:15]
+
+
+def _stem(filename: Path) -> str:
+    return filename.name.partition(".log")[0]
+
+
+@final
+class TrayNotifier(QtCore.QObject):
+    """Notify the new errors and warnings from the system tray.
+
+    Only the date of the newest elog is kept between two checks, and the
+    window is only created when the icon or a notification is clicked.
+    """
+
+    def __init__(self, config: Config, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self.config = config
+        self._latest = ""
+        # The newest elogs, with the date `_latest`, already seen.
+        self._latestNames: set[str] = set()
+        self._window: Elogviewer | None = None
+        self._tray = QtWidgets.QSystemTrayIcon(
+            QtGui.QIcon.fromTheme("applications-system"), self
+        )
+        self._tray.setToolTip("Elogviewer")
+        self._tray.activated.connect(self._onActivated)
+        self._tray.messageClicked.connect(self.showWindow)
+        self._checkTimer = QtCore.QTimer(self)
+        self._checkTimer.setSingleShot(True)
+        self._checkTimer.setInterval(_CHECK_DELAY_MS)
+        self._checkTimer.timeout.connect(self.check)
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._onDirectoryChanged)
+        self._watcher.fileChanged.connect(self._checkTimer.start)
+
+    def start(self) -> None:
+        self._watch()
+        self._update(scanSources(self.config.sources))
+        self._tray.show()
+
+    def _watch(self) -> None:
+        """Watch the sources and their category directories."""
+        paths = [str(path) for path in self.config.sources]
+        for path in self.config.sources:
+            if path.is_dir():
+                # The elogs may be sorted in category directories.
+                paths.extend(str(p) for p in path.iterdir() if p.is_dir())
+        watched = set(self._watcher.directories()) | set(self._watcher.files())
+        new = [path for path in paths if path not in watched]
+        if new:
+            self._watcher.addPaths(new)
+
+    def _onDirectoryChanged(self, path: str) -> None:
+        if Path(path) in self.config.sources:
+            # A new category directory.
+            self._watch()
+        self._checkTimer.start()
+
+    def window(self) -> Elogviewer | None:
+        return self._window
+
+    def check(self) -> Sequence[Elog]:
+        """Notify the errors and warnings among the new elogs."""
+        sources = self.config.sources
+        notified: list[Elog] = []
+        for filename in self._update(scanSources(sources)):
+            try:
+                elog = Elog.fromFilename(filename, source=sourceOf(filename, sources))
+            except ValueError:
+                continue
+            if elog.eclass in _NOTIFIED:
+                notified.append(elog)
+        if notified:
+            lines = [
+                f"{elog.category}/{elog.package}: {elog.eclass.name}"
+                for elog in notified[:_MAX_LISTED]
+            ]
+            if len(notified) > _MAX_LISTED:
+                lines.append(f"and {len(notified) - _MAX_LISTED} more")
+            self._tray.showMessage(
+                f"{len(notified)} new elogs",
+                "\n".join(lines),
+                QtWidgets.QSystemTrayIcon.MessageIcon.Warning,
+            )
+        return notified
+
+    def _update(self, filenames: Sequence[Path]) -> Sequence[Path]:
+        """Remember the newest of `filenames` and return the new ones."""
+        new = [
+            filename
+            for filename in filenames
+            if _dateKey(filename) > self._latest
+            or (
+                _dateKey(filename) == self._latest
+                and _stem(filename) not in self._latestNames
+            )
+        ]
+        if new:
+            self._latest = max(_dateKey(filename) for filename in new)
+            self._latestNames = {
+                _stem(filename)
+                for filename in filenames
+                if _dateKey(filename) == self._latest
+            }
+        return new
+
+    def showWindow(self) -> None:
+        if self._window is None:
+            # Only pay for the table and the bodies when asked to.
+            from .uiview import Elogviewer
+
+            self._window = Elogviewer(self.config)
+            self._window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+            self._window.destroyed.connect(self._onWindowDestroyed)
+            self._window.start()
+        self._window.show()
+        self._window.raise_()
+        self._window.activateWindow()
+
+    def _onWindowDestroyed(self) -> None:
+        self._window = None
+
+    def _onActivated(self, reason: QtWidgets.QSystemTrayIcon.ActivationReason) -> None:
+        if reason is QtWidgets.QSystemTrayIcon.ActivationReason.Trigger:
+            self.showWindow()
@@ -2,22 +2,43 @@
 
 from __future__ import annotations
 
+import logging
+from collections import OrderedDict
 from collections.abc import Callable
-from contextlib import AbstractContextManager
 from functools import partial
-from typing import IO, override
+from typing import Final, override
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 
 from .__version__ import __version__
-from .eclass import EClass
-from .model import Column, ElogModelItem
-from .parser import ColorStrategy, ParserFSM
+from .eclass import eclassColor
+from .elog import OPENERS
+from .indexer import Indexer
+from .model import Column, ElogModelItem, RetentionPolicy
+from .parser import makeHtml
 from .uicontroller import Config, ElogviewerController
-from .uimodel import Model, Role, sourceIndex
+from .uimodel import ElogFilterProxyModel, GroupModel, Model, Role, sourceIndex
 
 Qt = QtCore.Qt
 
+_LOGGER = logging.getLogger("elogviewer")
+
+# Defaults for the "Compress old" action, see the `compressAfterDays` and
+# `compressFormat` settings.
+_COMPRESS_AFTER_DAYS: Final = 30
+_COMPRESS_FORMAT: Final = ".xz"
+# Defaults for the "Prune" action, see the `retainPerPackage`, `retainDays`
+# and `retainImportant` settings.
+_RETAIN_PER_PACKAGE: Final = 10
+_RETAIN_DAYS: Final = 365
+# Above this many rows, see the `largeTableRows` setting, the columns are
+# no longer fitted to the contents of every row.
+_LARGE_TABLE_ROWS: Final = 10_000
+# Number of rows measured to size the columns of a large table.
+_LARGE_TABLE_SAMPLE: Final = 200
+# Number of rendered elogs kept for the identical ones.
+_HTML_CACHE_SIZE: Final = 32
+
 _ABOUT_HTML = (
     f"<h1>(k)elogviewer {__version__}</h1>"
     + "<br>".join(
@@ -47,35 +68,12 @@ _ABOUT_HTML = (
 )
 
 
-def _itemFromIndex(index: QtCore.QModelIndex) -> ElogModelItem:
-    assert index.isValid()
-    srcIndex = sourceIndex(index)
-    model = srcIndex.model()
-    assert isinstance(model, Model)
-    return model.itemFromIndex(srcIndex)
-
-
-def makeHtml(
-    file: AbstractContextManager[IO[str]], *, colorStrategy: ColorStrategy
-) -> str:
-    parsed: list[str | None] = []
-    with ParserFSM(parsed, colorStrategy=colorStrategy) as parser, file as f:
-        for line in f:
-            parser.parse(line)
-    return "\n".join(_ for _ in parsed if _ is not None)
-
-
-def eclassColor(eclass: EClass) -> tuple[int, int, int]:
-    return {
-        EClass.Error: (0xFF, 0x00, 0x00),
-        EClass.Warning: (0xE5, 0x67, 0x17),
-        EClass.Log: (0x00, 0x80, 0x00),
-        EClass.Info: (0x00, 0x80, 0x00),
-        EClass.QA: (0x00, 0x80, 0x00),
-    }[eclass]
-
-
 class TextToHtmlDelegate(QtWidgets.QItemDelegate):
+    def __init__(self, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        # The bodies rendered last by digest, shared by identical elogs.
+        self._htmlCache: OrderedDict[str, str] = OrderedDict()
+
     @override
     def __repr__(self) -> str:
         return f"elogviewer.{self.__class__.__name__}({self.parent()!r})"
@@ -92,44 +90,20 @@ class TextToHtmlDelegate(QtWidgets.QItemDelegate):
         assert isinstance(model, Model)
         item = model.itemFromIndex(index)
         header = f"<h2>{item.category()}/{item.package()}</h2>"
-        editor.setHtml(header + makeHtml(item.file(), colorStrategy=eclassColor))
-
-
-class SeverityColorDelegate(QtWidgets.QStyledItemDelegate):
-    @override
-    def paint(
-        self,
-        painter: QtGui.QPainter | None,
-        option: QtWidgets.QStyleOptionViewItem,
-        index: QtCore.QModelIndex,
-    ) -> None:
-        if not index.isValid():
-            return
-        self.initStyleOption(option, index)
-        if option.text is None:
-            return super().paint(painter, option, index)
-        try:
-            color = QtGui.QColor(*eclassColor(EClass[option.text]))
-        except KeyError:
-            pass
+        editor.setHtml(header + self._bodyHtml(item))
+
+    def _bodyHtml(self, item: ElogModelItem) -> str:
+        digest = item.digest()
+        body = self._htmlCache.get(digest) if digest else None
+        if body is None:
+            body = makeHtml(item.file(), colorStrategy=eclassColor)
+            if digest:
+                self._htmlCache[digest] = body
+                if len(self._htmlCache) > _HTML_CACHE_SIZE:
+                    self._htmlCache.popitem(last=False)
         else:
-            option.palette.setColor(QtGui.QPalette.ColorRole.Text, color)
-        super().paint(painter, option, index)
-
-
-class ReadFontStyleDelegate(QtWidgets.QStyledItemDelegate):
-    @override
-    def paint(
-        self,
-        painter: QtGui.QPainter | None,
-        option: QtWidgets.QStyleOptionViewItem,
-        index: QtCore.QModelIndex,
-    ) -> None:
-        if not index.isValid():
-            return
-        self.initStyleOption(option, index)
-        option.font.setBold(not _itemFromIndex(index).isReadState())
-        super().paint(painter, option, index)
+            self._htmlCache.move_to_end(digest)
+        return body
 
 
 class ButtonDelegate(QtWidgets.QStyledItemDelegate):
@@ -150,7 +124,7 @@ class ButtonDelegate(QtWidgets.QStyledItemDelegate):
         index: QtCore.QModelIndex,
     ) -> None:
         super().initStyleOption(option, index)
-        if option is None:
+        if option is None or not index.flags() & Qt.ItemFlag.ItemIsUserCheckable:
             return
         option.features &= (
             ~QtWidgets.QStyleOptionViewItem.ViewItemFeature.HasCheckIndicator
@@ -221,7 +195,7 @@ class ButtonDelegate(QtWidgets.QStyledItemDelegate):
 
 
 class Elogviewer(QtWidgets.QMainWindow):
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, *, indexer: Indexer | None = None) -> None:
         super().__init__()
         self._settings = QtCore.QSettings("elogviewer", "elogviewer")
         centralWidget = QtWidgets.QWidget(self)
@@ -245,6 +219,16 @@ class Elogviewer(QtWidgets.QMainWindow):
         verticalHeader.hide()
         centralLayout.addWidget(self.tableView)
 
+        # Set up on first use, see `_setUpTreeView()`.
+        self.treeView = QtWidgets.QTreeView(centralWidget)
+        self.treeView.setSortingEnabled(True)
+        self.treeView.setUniformRowHeights(True)
+        self.treeView.setSelectionMode(self.treeView.SelectionMode.ExtendedSelection)
+        self.treeView.hide()
+        centralLayout.addWidget(self.treeView)
+        self.groupModel: GroupModel | None = None
+        self.groupProxyModel: QtCore.QSortFilterProxyModel | None = None
+
         self.textEdit = QtWidgets.QTextBrowser(centralWidget)
         self.textEdit.setOpenExternalLinks(True)
         self.textEdit.setText("""No elog selected.""")
@@ -261,11 +245,21 @@ class Elogviewer(QtWidgets.QMainWindow):
         statusBar.addWidget(self.unreadLabel)
 
         self.model = Model(self.tableView)
-        self.proxyModel = QtCore.QSortFilterProxyModel(self.tableView)
+        self.proxyModel = ElogFilterProxyModel(self.tableView)
         self.proxyModel.setFilterKeyColumn(Column.Package)
         self.proxyModel.setSortRole(Role.SortRole)
         self.proxyModel.setSourceModel(self.model)
         self.tableView.setModel(self.proxyModel)
+        self._largeTable = False
+        self._largeTableRows = int(
+            self._settings.value("largeTableRows", _LARGE_TABLE_ROWS)
+        )
+        self.model.modelReset.connect(self._updateTableMode)
+        self.model.rowsInserted.connect(self._updateTableMode)
+        self.model.rowsRemoved.connect(self._updateTableMode)
+        self.model.modelReset.connect(self._onRowsChanged)
+        self.model.rowsInserted.connect(self._onRowsChanged)
+        self.model.rowsRemoved.connect(self._onRowsChanged)
         selectionModel = self.tableView.selectionModel()
         assert selectionModel is not None
 
@@ -274,22 +268,25 @@ class Elogviewer(QtWidgets.QMainWindow):
             self.proxyModel,
             selectionModel,
             config,
+            indexer=indexer,
+            parent=self,
+        )
+        self.controller.throttle.bytesPerSecond = float(
+            self._settings.value("scanBytesPerSecond", 0)
         )
         self.controller.statusTextChanged.connect(self.statusLabel.setText)
         self.controller.unreadTextChanged.connect(self._setUnreadText)
         self.controller.errorOccurred.connect(self._showError)
         self.controller.rowSelectRequested.connect(self.tableView.selectRow)
-        self.model.dataChanged.connect(self.controller.saveSettings)
+        self.model.statesChanged.connect(self.controller.saveSettings)
 
         horizontalHeader.sortIndicatorChanged.connect(self.proxyModel.sort)
 
         for column, delegate in (
             (Column.ImportantState, ButtonDelegate("★", "☆", self.tableView)),
             (Column.ReadState, ButtonDelegate("●", "○", self.tableView)),
-            (Column.Eclass, SeverityColorDelegate(self.tableView)),
         ):
             self.tableView.setItemDelegateForColumn(column, delegate)
-        self.tableView.setItemDelegate(ReadFontStyleDelegate(self.tableView))
 
         self.textEditMapper = QtWidgets.QDataWidgetMapper(self.tableView)
         self.textEditMapper.setSubmitPolicy(self.textEditMapper.SubmitPolicy.AutoSubmit)
@@ -302,6 +299,8 @@ class Elogviewer(QtWidgets.QMainWindow):
             )
         )
         selectionModel.currentRowChanged.connect(self.controller.onCurrentRowChanged)
+        self.textEditMapper.currentIndexChanged.connect(self._onPreviewChanged)
+        self.controller.diffReady.connect(self._showDiff)
 
         self.refreshAction = self._addToolBarAction(
             "view-refresh",
@@ -330,6 +329,48 @@ class Elogviewer(QtWidgets.QMainWindow):
             self.controller.deleteSelected,
             shortcut=QtGui.QKeySequence.StandardKey.Delete,
         )
+        self.compressAction = self._addToolBarAction(
+            "archive-insert",
+            "Compress old",
+            lambda: self.controller.compressOldElogs(
+                olderThanDays=int(
+                    self._settings.value("compressAfterDays", _COMPRESS_AFTER_DAYS)
+                ),
+                ext=self.compressFormat(),
+            ),
+        )
+        self.pruneAction = self._addToolBarAction(
+            "edit-clear-history",
+            "Prune",
+            self._prune,
+        )
+        self.groupAction = self._addToolBarAction(
+            "view-list-tree",
+            "Group by package",
+            self._toggleGrouped,
+        )
+        self.groupAction.setCheckable(True)
+        self.collapseAction = self._addToolBarAction(
+            "edit-copy",
+            "Collapse duplicates",
+            self._toggleCollapsed,
+        )
+        self.collapseAction.setCheckable(True)
+        self.lastRunAction = self._addToolBarAction(
+            "document-open-recent",
+            "Last run",
+            self._toggleLastRun,
+        )
+        self.lastRunAction.setCheckable(True)
+        self.diffAction = self._addToolBarAction(
+            "document-compare",
+            "Diff with previous",
+            self._toggleDiff,
+        )
+        self.diffAction.setCheckable(True)
+        self.diffAction.setChecked(
+            self._settings.value("previewDiff", False, type=bool)
+        )
         self.aboutAction = self._addToolBarAction(
             "help-about",
             "About",
@@ -355,6 +396,12 @@ class Elogviewer(QtWidgets.QMainWindow):
             self.toggleImportantAction
         )
         self.deleteButton = self.toolBar.widgetForAction(self.deleteAction)
+        self.compressButton = self.toolBar.widgetForAction(self.compressAction)
+        self.pruneButton = self.toolBar.widgetForAction(self.pruneAction)
+        self.groupButton = self.toolBar.widgetForAction(self.groupAction)
+        self.collapseButton = self.toolBar.widgetForAction(self.collapseAction)
+        self.lastRunButton = self.toolBar.widgetForAction(self.lastRunAction)
+        self.diffButton = self.toolBar.widgetForAction(self.diffAction)
         self.aboutButton = self.toolBar.widgetForAction(self.aboutAction)
 
         self.searchLineEdit = QtWidgets.QLineEdit(self.toolBar)
@@ -362,8 +409,17 @@ class Elogviewer(QtWidgets.QMainWindow):
         self.searchLineEdit.textEdited.connect(self.controller.setFilterPattern)
         self.toolBar.addWidget(self.searchLineEdit)
 
+        # The Source column only tells elogs apart with named directories.
+        self.tableView.setColumnHidden(Column.Source, not any(config.sources.values()))
+
         self._restoreWindowState()
         self.tableView.selectRow(0)
+        if self._settings.value("collapseDuplicates", False, type=bool):
+            self.collapseAction.setChecked(True)
+            self._toggleCollapsed()
+        if self._settings.value("groupByPackage", False, type=bool):
+            self.groupAction.setChecked(True)
+            self._toggleGrouped()
 
     def start(self) -> None:
         self.controller.start()
@@ -377,12 +433,180 @@ class Elogviewer(QtWidgets.QMainWindow):
         shortcut: QtGui.QKeySequence.StandardKey | None = None,
     ) -> QtGui.QAction:
         action = QtGui.QAction(QtGui.QIcon.fromTheme(iconName), text, self.toolBar)
+        action.setData(iconName)
         if shortcut is not None:
             action.setShortcut(shortcut)
         action.triggered.connect(slot)
         self.toolBar.addAction(action)
         return action
 
+    def reloadIcons(self) -> None:
+        """Look the icons up again after a change of icon theme."""
+        for action in self.toolBar.actions():
+            iconName = action.data()
+            if isinstance(iconName, str):
+                action.setIcon(QtGui.QIcon.fromTheme(iconName))
+
+    def compressFormat(self) -> str:
+        """Return the `compressFormat` setting if it names a usable format."""
+        ext = str(self._settings.value("compressFormat", _COMPRESS_FORMAT))
+        if ext == ".log" or ext not in OPENERS:
+            _LOGGER.warning(
+                "unusable compress format %r, using %s", ext, _COMPRESS_FORMAT
+            )
+            return _COMPRESS_FORMAT
+        return ext
+
+    def retentionPolicy(self) -> RetentionPolicy:
+        settings = self._settings
+        return RetentionPolicy(
+            keepPerPackage=int(settings.value("retainPerPackage", _RETAIN_PER_PACKAGE)),
+            maxAgeDays=float(settings.value("retainDays", _RETAIN_DAYS)),
+            keepImportant=settings.value("retainImportant", True, type=bool),
+        )
+
+    def _prune(self) -> None:
+        policy = self.retentionPolicy()
+        expired = self.controller.expiredElogs(policy)
+        if not expired:
+            QtWidgets.QMessageBox.information(self, "Prune", "No elog to prune.")
+            return
+        limits = [
+            f"the {policy.keepPerPackage} newest of every package"
+            if policy.keepPerPackage
+            else "",
+            f"the last {policy.maxAgeDays:g} days" if policy.maxAgeDays else "",
+            "the important ones" if policy.keepImportant else "",
+        ]
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "Prune",
+            f"Delete {len(expired)} elogs and keep "
+            + f"{', '.join(limit for limit in limits if limit)}?",
+        )
+        if answer is QtWidgets.QMessageBox.StandardButton.Yes:
+            self.controller.prune(expired)
+
+    def _toggleCollapsed(self) -> None:
+        collapsed = self.collapseAction.isChecked()
+        self._settings.setValue("collapseDuplicates", collapsed)
+        self.proxyModel.setCollapseDuplicates(collapsed)
+
+    def _toggleLastRun(self) -> None:
+        self.proxyModel.setDateRange(
+            self.model.dateIndex().lastSession()
+            if self.lastRunAction.isChecked()
+            else None
+        )
+
+    def _onRowsChanged(self) -> None:
+        # A new emerge session replaces the last one.
+        if self.lastRunAction.isChecked():
+            self._toggleLastRun()
+
+    def _toggleDiff(self) -> None:
+        self._settings.setValue("previewDiff", self.diffAction.isChecked())
+        if self.diffAction.isChecked():
+            self._onPreviewChanged(self.textEditMapper.currentIndex())
+        else:
+            self.textEditMapper.revert()
+
+    def _onPreviewChanged(self, row: int) -> None:
+        if self.diffAction.isChecked() and 0 <= row < self.model.rowCount():
+            self.controller.requestDiff(self.model.item(row))
+
+    def _showDiff(self, item: ElogModelItem, html: str) -> None:
+        row = self.textEditMapper.currentIndex()
+        if (
+            not self.diffAction.isChecked()
+            or not 0 <= row < self.model.rowCount()
+            or self.model.item(row) is not item
+        ):
+            # The selection moved on in the meantime.
+            return
+        self.textEdit.setHtml(f"<h2>{item.category()}/{item.package()}</h2>{html}")
+
+    def _toggleGrouped(self) -> None:
+        grouped = self.groupAction.isChecked()
+        self._settings.setValue("groupByPackage", grouped)
+        if grouped and self.groupModel is None:
+            self._setUpTreeView()
+        self.tableView.setVisible(not grouped)
+        self.treeView.setVisible(grouped)
+        # The actions apply to the rows shown.
+        self.controller.setGroupedSelection(
+            self.treeView.selectionModel() if grouped else None
+        )
+
+    def _setUpTreeView(self) -> None:
+        self.groupModel = GroupModel(self.model, self.treeView)
+        self.groupProxyModel = proxyModel = QtCore.QSortFilterProxyModel(self.treeView)
+        proxyModel.setRecursiveFilteringEnabled(True)
+        proxyModel.setFilterKeyColumn(Column.Package)
+        proxyModel.setSortRole(Role.SortRole)
+        proxyModel.setSourceModel(self.groupModel)
+        proxyModel.setFilterRegularExpression(self.searchLineEdit.text())
+        self.searchLineEdit.textEdited.connect(proxyModel.setFilterRegularExpression)
+        self.treeView.setModel(proxyModel)
+        for column, delegate in (
+            (Column.ImportantState, ButtonDelegate("★", "☆", self.treeView)),
+            (Column.ReadState, ButtonDelegate("●", "○", self.treeView)),
+        ):
+            self.treeView.setItemDelegateForColumn(column, delegate)
+        self.treeView.setColumnHidden(
+            Column.Source, self.tableView.isColumnHidden(Column.Source)
+        )
+        self.treeView.sortByColumn(Column.Date, Qt.SortOrder.DescendingOrder)
+        selectionModel = self.treeView.selectionModel()
+        assert selectionModel is not None
+        selectionModel.currentRowChanged.connect(self._onGroupedCurrentRowChanged)
+
+    def _onGroupedCurrentRowChanged(
+        self,
+        current: QtCore.QModelIndex,
+        previous: QtCore.QModelIndex,
+    ) -> None:
+        assert self.groupModel is not None
+        item = self.groupModel.itemFromIndex(sourceIndex(current))
+        if item is None:
+            return
+        row = self.model.rowOfItem(item)
+        self.textEditMapper.setCurrentModelIndex(self.model.index(row, 0))
+        if previous.isValid():
+            self.model.setReadState(
+                self.model.index(row, Column.ReadState), Qt.CheckState.Checked
+            )
+            self.controller.updateUnreadCount()
+
+    def isLargeTable(self) -> bool:
+        return self._largeTable
+
+    def _updateTableMode(self) -> None:
+        """Stop measuring every row once the table grows large."""
+        large = self.model.rowCount() > self._largeTableRows
+        if large == self._largeTable:
+            return
+        self._largeTable = large
+        horizontalHeader = self.tableView.horizontalHeader()
+        verticalHeader = self.tableView.verticalHeader()
+        assert horizontalHeader is not None
+        assert verticalHeader is not None
+        if not large:
+            horizontalHeader.setSectionResizeMode(
+                horizontalHeader.ResizeMode.ResizeToContents
+            )
+            verticalHeader.setSectionResizeMode(verticalHeader.ResizeMode.Interactive)
+            return
+        verticalHeader.setSectionResizeMode(verticalHeader.ResizeMode.Fixed)
+        horizontalHeader.setSectionResizeMode(horizontalHeader.ResizeMode.Interactive)
+        widths = self._settings.value("columnWidths", [], type=list)
+        if len(widths) == horizontalHeader.count():
+            for column, width in enumerate(widths):
+                horizontalHeader.resizeSection(column, int(width))
+            return
+        horizontalHeader.setResizeContentsPrecision(_LARGE_TABLE_SAMPLE)
+        self.tableView.resizeColumnsToContents()
+
     def _setUnreadText(self, text: str) -> None:
         self.unreadLabel.setText(text)
         self.setWindowTitle(f"Elogviewer ({text})")
@@ -424,8 +648,18 @@ class Elogviewer(QtWidgets.QMainWindow):
         self._settings.setValue("sortOrder", horizontalHeader.sortIndicatorOrder())
         self._settings.setValue("windowWidth", self.width())
         self._settings.setValue("windowHeight", self.height())
+        if self._largeTable:
+            self._settings.setValue(
+                "columnWidths",
+                [
+                    horizontalHeader.sectionSize(column)
+                    for column in range(horizontalHeader.count())
+                ],
+            )
 
     @override
     def closeEvent(self, a0: QtGui.QCloseEvent | None) -> None:
         self._saveWindowState()
+        self.controller.flushSettings()
+        self.controller.saveSnapshot()
         super().closeEvent(a0)
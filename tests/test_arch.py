@@ -3,10 +3,18 @@ from archunitpython import assert_passes, project_files, project_layers
 from archunitpython.common.types import Pattern
 
 MODEL_FILES = (
+    "src/elogviewer/archive.py",
     "src/elogviewer/eclass.py",
     "src/elogviewer/elog.py",
+    "src/elogviewer/export.py",
+    "src/elogviewer/indexer.py",
+    "src/elogviewer/journal.py",
+    "src/elogviewer/makeconf.py",
     "src/elogviewer/model.py",
     "src/elogviewer/parser.py",
+    "src/elogviewer/snapshot.py",
+    "src/elogviewer/tarindex.py",
+    "src/elogviewer/throttle.py",
 )
 
 
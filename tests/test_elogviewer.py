@@ -1,10 +1,18 @@
 from __future__ import annotations
 
+import functools
+import gzip
 import io
+import json
+import multiprocessing
 import os
 import random
+import socket
+import tarfile
+import threading
 import time
-from collections.abc import Iterable, Iterator, Sequence
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import closing
 from dataclasses import dataclass
 from pathlib import Path
@@ -17,17 +25,52 @@ from PyQt6.QtCore import Qt
 from pytestqt.modeltest import ModelTester as QtModelTester
 from pytestqt.qtbot import QtBot
 
-from elogviewer.eclass import EClass
-from elogviewer.elog import Elog
-from elogviewer.model import Column
+from elogviewer import export
+from elogviewer.archive import compressOld
+from elogviewer.eclass import EClass, eclassColor
+from elogviewer.elog import (
+    OPENERS,
+    Elog,
+    digestOf,
+    loadElogs,
+    openArchives,
+    scanSources,
+    sourceOf,
+)
+from elogviewer.export import exportElogs
+from elogviewer.indexer import (
+    ElogIndex,
+    IndexDelta,
+    IndexerServer,
+    SocketIndexer,
+    connectIndexer,
+)
+from elogviewer.journal import JournalStateStore, pathKey
+from elogviewer.makeconf import elogpathFromMakeConf, readMakeConf
+from elogviewer.model import (
+    IMPORTANT,
+    READ,
+    Column,
+    DateIndex,
+    ElogGroup,
+    ElogModelItem,
+    PackageHistory,
+    RetentionPolicy,
+)
 from elogviewer.parser import (
     AbstractState,
     BodyState,
     HeaderState,
     NoopState,
     ParserFSM,
+    makeDiffHtml,
+    makeHtml,
 )
-from elogviewer.uiview import Elogviewer, eclassColor, makeHtml
+from elogviewer.snapshot import loadSnapshot, saveSnapshot
+from elogviewer.throttle import Throttle, lowerIoPriority, lowerPriority
+from elogviewer.uimodel import Model, sourceIndex
+from elogviewer.uitray import TrayNotifier
+from elogviewer.uiview import Elogviewer
 
 from . import fuzz as _fuzz
 
@@ -63,7 +106,7 @@ def randomElogFileName() -> str:
 
 @dataclass(frozen=True)
 class Config:
-    elogpath: Path
+    sources: Mapping[Path, str]
 
 
 @dataclass(frozen=True)
@@ -155,6 +198,57 @@ class TestElogClassUnit:
     )
     def testGetClassMisc(self, content: str, eclass: EClass) -> None:
         assert Elog.getClass(content) is eclass
+        assert Elog.getClass(content.encode()) is eclass
+
+    def testBadBytesAreReplaced(self, tmp_path: Path) -> None:
+        path = tmp_path / "cat:pkg-1.0:20200101-000000.log"
+        path.write_bytes(b"WARN: postinst\nbroken \xff build\n")
+
+        elog = Elog.fromFilename(path)
+
+        assert elog.eclass is EClass.Warning
+        assert elog.read() == "WARN: postinst\nbroken \ufffd build\n"
+
+    def testCorruptedElogDoesNotEndTheScan(self, tmp_path: Path) -> None:
+        corrupted = tmp_path / "cat:pkg-1.0:20200101-000000.log.gz"
+        corrupted.write_bytes(b"\x1f\x8b not gzip")
+        plain = tmp_path / "cat:pkg-1.0:20200102-000000.log"
+        plain.write_text("INFO: setup\n")
+        misnamed = tmp_path / "cat:pkg-1.0:notadate.log"
+        misnamed.write_text("INFO: setup\n")
+
+        elogs = loadElogs([corrupted, plain, misnamed], {})
+
+        assert [(elog.filename, elog.eclass) for elog in elogs] == [
+            (corrupted, EClass.Error),
+            (plain, EClass.Info),
+        ]
+
+    def testEmptyPlainElog(self, tmp_path: Path) -> None:
+        path = tmp_path / "cat:pkg-1.0:20200101-000000.log"
+        path.touch()
+
+        elog = Elog.fromFilename(path)
+
+        assert elog.eclass is EClass.Log
+        assert elog.read() == ""
+
+    def testDigestIgnoresCompression(self, tmp_path: Path) -> None:
+        contents = randomElogContent(EClass.Warning, "postinst")
+        plain = tmp_path / "cat:pkg-1.0:20200101-000000.log"
+        plain.write_text(contents)
+        compressed = tmp_path / "cat:pkg-1.1:20200102-000000.log.xz"
+        with OPENERS[".xz"](compressed, "wb") as f:
+            f.write(contents.encode())
+        other = tmp_path / "cat:pkg-1.2:20200103-000000.log"
+        other.write_text(f"{contents}\n")
+
+        digests = [
+            Elog.fromFilename(path).digest for path in (plain, compressed, other)
+        ]
+
+        assert digests[0] == digests[1] == digestOf(contents.encode())
+        assert digests[2] != digests[0]
 
 
 class TestElogClass:
@@ -189,11 +283,30 @@ class TestElogClass:
         assert elogClassInstance.filename == elogPath / elogFile.fileName
 
     def testContents(self, elogClassInstance: Elog, elogFile: FakeElog) -> None:
-        assert elogClassInstance.contents == elogFile.content
+        assert elogClassInstance.read() == elogFile.content
 
     def testEClass(self, elogClassInstance: Elog, eclass: EClass) -> None:
         assert elogClassInstance.eclass is eclass
 
+    @pytest.mark.parametrize("ext", sorted(OPENERS.keys() - {".log"}))
+    def testCompressed(
+        self,
+        elogPath: Path,
+        elogFile: FakeElog,
+        eclass: EClass,
+        ext: str,
+        fs: _FakeFilesystem,
+    ) -> None:
+        path = elogPath / f"{elogFile.fileName}{ext}"
+        fs.create_file(path)
+        with OPENERS[ext](path, "wb") as f:
+            f.write(elogFile.content.encode())
+
+        elog = Elog.fromFilename(path)
+
+        assert elog.read() == elogFile.content
+        assert elog.eclass is eclass
+
     @pytest.mark.parametrize(
         "elogText, elogHtml",
         [
@@ -266,6 +379,794 @@ class TestElogClass:
         )
 
 
+class TestElogModelItem:
+    @pytest.fixture
+    def item(self) -> ElogModelItem:
+        return ElogModelItem(
+            Elog(
+                Path("/cat-egory:package-1.0:20200102-030405.log"),
+                "cat-egory",
+                "package-1.0",
+                time.strptime("20200102-030405", "%Y%m%d-%H%M%S"),
+                EClass.Warning,
+                "WARN: xxx",
+            )
+        )
+
+    def testDisplayText(self, item: ElogModelItem) -> None:
+        assert item.displayText(Column.Category) == "cat-egory"
+        assert item.displayText(Column.Package) == "package-1.0"
+        assert item.displayText(Column.Eclass) == "Warning"
+        assert item.displayText(Column.Date) == item.localeTime()
+        assert item.displayText(Column.ReadState) == ""
+
+    def testTimestampIsLocalTime(self, item: ElogModelItem) -> None:
+        assert time.localtime(item.timestamp())[:6] == (2020, 1, 2, 3, 4, 5)
+
+    def testSortKeyFollowsReadState(self, item: ElogModelItem) -> None:
+        unreadKey = item.sortKey(Column.ReadState)
+        item.setReadState(READ)
+        assert item.sortKey(Column.ReadState) > unreadKey
+
+    def testSortKeyEndsWithDate(self, item: ElogModelItem) -> None:
+        for column in Column:
+            assert item.sortKey(column).endswith("2020-01-02 03:04:05")
+
+    @pytest.mark.parametrize(
+        "package, name",
+        [
+            ("package-1.0", "package"),
+            ("gentoo-sources-6.6.30-r1", "gentoo-sources"),
+            ("python-3.12.3_p1", "python"),
+            ("libfoo2-0_pre20240101", "libfoo2"),
+        ],
+    )
+    def testPackageName(self, package: str, name: str) -> None:
+        item = ElogModelItem(
+            Elog(Path("/x"), "cat", package, time.gmtime(0), EClass.Log, "")
+        )
+        assert item.packageName() == name
+
+
+class TestElogGroup:
+    @staticmethod
+    def item(eclass: EClass, date: str) -> ElogModelItem:
+        return ElogModelItem(
+            Elog(
+                Path(f"/cat:pkg-1.0:{date}.log"),
+                "cat",
+                "pkg-1.0",
+                time.strptime(date, "%Y%m%d-%H%M%S"),
+                eclass,
+                "",
+            )
+        )
+
+    def testAggregates(self) -> None:
+        items = [
+            self.item(EClass.Info, "20200101-000000"),
+            self.item(EClass.Error, "20200301-000000"),
+            self.item(EClass.Warning, "20200201-000000"),
+        ]
+        group = ElogGroup(*ElogGroup.key(items[0]))
+        group.addItems(items)
+
+        assert (group.category, group.name) == ("cat", "pkg")
+        assert group.count() == 3
+        assert group.unreadCount() == 3
+        assert group.worstEclass() is EClass.Error
+        assert group.latest() is items[1]
+
+        items[0].setReadState(READ)
+        group.refresh(items[0])
+        group.removeItems(1, 1)
+
+        assert group.count() == 2
+        assert group.unreadCount() == 1
+        assert group.worstEclass() is EClass.Warning
+        assert group.latest() is items[2]
+
+
+class TestPackageHistory:
+    @staticmethod
+    def item(package: str, date: str) -> ElogModelItem:
+        return ElogModelItem(
+            Elog(
+                Path(f"/cat:{package}:{date}.log"),
+                "cat",
+                package,
+                time.strptime(date, "%Y%m%d-%H%M%S"),
+                EClass.Info,
+                "",
+            )
+        )
+
+    def testPrevious(self) -> None:
+        newest = self.item("pkg-1.2", "20200301-000000")
+        oldest = self.item("pkg-1.0", "20200101-000000")
+        middle = self.item("pkg-1.1", "20200201-000000")
+        other = self.item("other-1.0", "20200215-000000")
+        history = PackageHistory([newest, other, oldest, middle])
+
+        assert history.history(middle) == [oldest, middle, newest]
+        assert history.previous(newest) is middle
+        assert history.previous(middle) is oldest
+        assert history.previous(oldest) is None
+        assert history.previous(other) is None
+
+    def testRetentionPolicy(self) -> None:
+        items = [self.item(f"pkg-1.{n}", f"2020030{n}-000000") for n in range(1, 6)]
+        items[0].setImportantState(IMPORTANT)
+        other = self.item("other-1.0", "20200301-000000")
+        history = PackageHistory([*items, other])
+        now = time.mktime(time.strptime("20200306", "%Y%m%d"))
+
+        assert RetentionPolicy().expired(history, now=now) == []
+        assert RetentionPolicy(keepPerPackage=2).expired(history, now=now) == items[1:3]
+        assert RetentionPolicy(maxAgeDays=3.5).expired(history, now=now) == [
+            items[1],
+            other,
+        ]
+        assert RetentionPolicy(keepPerPackage=4, keepImportant=False).expired(
+            history, now=now
+        ) == [items[0]]
+
+    def testDiffHtml(self) -> None:
+        html = makeDiffHtml("same\nold <line>\n", "same\nnew line\n")
+
+        assert "- old &lt;line&gt;" in html
+        assert "+ new line" in html
+        assert makeDiffHtml("same\n", "same\n") == ""
+
+    def testDiffHtmlKeepsLinesLikeHeaders(self) -> None:
+        html = makeDiffHtml("a\n-- x\nb\n", "a\n++ y\nb\n")
+
+        assert "- -- x" in html
+        assert "+ ++ y" in html
+
+
+class TestDateIndex:
+    item = staticmethod(TestPackageHistory.item)
+
+    def testBetween(self) -> None:
+        items = [
+            self.item(f"pkg-{day}", f"202003{day:02d}-000000") for day in (3, 1, 2)
+        ]
+        index = DateIndex(items)
+        start = time.mktime(time.strptime("20200302", "%Y%m%d"))
+
+        assert index.between(start, start + 86400) == [items[2], items[0]]
+        assert index.between(start + 1, start + 2) == []
+
+    def testSessions(self) -> None:
+        index = DateIndex(
+            self.item(f"pkg-{n}", date)
+            for n, date in enumerate(
+                (
+                    "20200301-000000",
+                    "20200301-003000",
+                    "20200301-100000",
+                    "20200301-110000",
+                    "20200301-120000",
+                )
+            )
+        )
+        [(start, end), last] = index.sessions(gap=2 * 3600)
+
+        assert end - start == 1800
+        assert index.lastSession(gap=2 * 3600) == last
+        assert last[1] - last[0] == 2 * 3600
+        assert len(index.sessions(gap=1800)) == 5
+        assert DateIndex([]).lastSession() is None
+
+
+class TestSources:
+    @pytest.fixture
+    def sources(self, tmp_path: Path) -> Mapping[Path, str]:
+        sources = {tmp_path / "a": "host-a", tmp_path / "b": "host-b"}
+        for root in sources:
+            path = root / randomElogFileName()
+            path.parent.mkdir(parents=True)
+            path.write_text(randomElogContent(EClass.Info, "setup"))
+        # Elogs may also be sorted by category.
+        category, package, date = randomElogFileName().split(":")
+        path = tmp_path / "b" / category / f"{package}:{date}"
+        path.parent.mkdir()
+        path.write_text(randomElogContent(EClass.Error, "setup"))
+        return sources
+
+    def testScanFindsEveryDirectory(self, sources: Mapping[Path, str]) -> None:
+        filenames = scanSources(sources)
+
+        assert len(filenames) == 3
+        assert sorted(sourceOf(f, sources) for f in filenames) == [
+            "host-a",
+            "host-b",
+            "host-b",
+        ]
+
+    def testModelShowsSource(self, sources: Mapping[Path, str], tmp_path: Path) -> None:
+        model = Model()
+        model.populate(
+            scanSources(sources),
+            settings=JournalStateStore(tmp_path / "state.journal"),
+            sources=sources,
+        )
+
+        assert sorted(
+            model.index(row, Column.Source).data() for row in range(model.rowCount())
+        ) == ["host-a", "host-b", "host-b"]
+
+
+class TestTarArchive:
+    @pytest.fixture
+    def elogs(self) -> Mapping[str, str]:
+        return {
+            randomElogFileName(): randomElogContent(eclass, "postinst")
+            for eclass in EClass
+        }
+
+    @pytest.fixture
+    def archive(
+        self,
+        tmp_path: Path,
+        elogs: Mapping[str, str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> Path:
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        archive = tmp_path / "elogs.tar.gz"
+        with tarfile.open(archive, "w:gz") as tar:
+            for name, content in elogs.items():
+                data = content.encode()
+                info = tarfile.TarInfo(f"elog/{name}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        return archive
+
+    def testReadMembers(self, archive: Path, elogs: Mapping[str, str]) -> None:
+        loaded = loadElogs(scanSources({archive: "old"}), {archive: "old"})
+
+        assert sorted(elog.filename.name for elog in loaded) == sorted(elogs)
+        for elog in loaded:
+            assert elog.source == "old"
+            assert elog.contents is None
+            assert elog.read() == elogs[elog.filename.name]
+            assert elog.eclass is Elog.getClass(elogs[elog.filename.name])
+            assert elog.digest == digestOf(elogs[elog.filename.name].encode())
+
+    def testReadCompressedMembers(
+        self,
+        tmp_path: Path,
+        elogs: Mapping[str, str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        archive = tmp_path / "elogs.tar"
+        with tarfile.open(archive, "w") as tar:
+            for name, content in elogs.items():
+                data = gzip.compress(content.encode())
+                info = tarfile.TarInfo(f"elog/{name}.gz")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        loaded = loadElogs(scanSources({archive: ""}), {archive: ""})
+
+        assert len(loaded) == len(elogs)
+        for elog in loaded:
+            content = elogs[elog.filename.name.removesuffix(".gz")]
+            assert elog.read() == content
+            assert elog.eclass is Elog.getClass(content)
+            assert elog.digest == digestOf(content.encode())
+
+    def testOpenArchivesOfSnapshot(
+        self,
+        archive: Path,
+        elogs: Mapping[str, str],
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        sources = {archive: ""}
+        snapshot = tmp_path / "snapshot"
+        saveSnapshot(
+            snapshot,
+            map(ElogModelItem, loadElogs(scanSources(sources), sources)),
+            sources,
+        )
+        # A new process knows the elogs from the snapshot only.
+        monkeypatch.setattr("elogviewer.elog._ARCHIVES", {})
+        items = loadSnapshot(snapshot, sources)
+        assert items is not None
+
+        openArchives(sources)
+
+        assert len(items) == len(elogs)
+        for item in items:
+            with item.file() as f:
+                assert f.read() == elogs[item.filename().name]
+
+    def testMembersNeverExpire(self, archive: Path) -> None:
+        items = map(ElogModelItem, loadElogs(scanSources({archive: ""}), {archive: ""}))
+        policy = RetentionPolicy(keepPerPackage=1, maxAgeDays=1)
+
+        later = time.time() + 1000 * 86400
+        assert policy.expired(PackageHistory(items), now=later) == []
+
+    def testSkipBadArchives(self, tmp_path: Path) -> None:
+        corrupt = tmp_path / "corrupt.tar"
+        corrupt.write_bytes(b"not a tar archive")
+        sources = {corrupt: "corrupt", tmp_path / "missing.tar": "missing"}
+
+        assert scanSources(sources) == []
+
+    def testIndexIsCached(
+        self,
+        archive: Path,
+        elogs: Mapping[str, str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        scanSources({archive: ""})
+
+        def fail(*_args: object, **_kwargs: object) -> None:
+            raise AssertionError("the archive is indexed again")
+
+        monkeypatch.setattr(tarfile, "open", fail)
+        assert len(scanSources({archive: ""})) == len(elogs)
+
+
+class TestMakeConf:
+    def testReadAssignments(self, tmp_path: Path) -> None:
+        makeConf = tmp_path / "make.conf"
+        makeConf.mkdir()
+        (makeConf / "00-base").write_text(
+            'EPREFIX="/prefix"\n# PORT_LOGDIR=/commented\nUSE="X qt6\n  wayland"\n'
+        )
+        (makeConf / "10-logs").write_text(
+            "export PORT_LOGDIR=\"${EPREFIX}/logs\"  # comment\nLITERAL='$EPREFIX'\n"
+        )
+
+        variables = readMakeConf([makeConf])
+
+        assert variables["PORT_LOGDIR"] == "/prefix/logs"
+        assert variables["LITERAL"] == "$EPREFIX"
+
+    def testElogpath(self, tmp_path: Path) -> None:
+        makeConf = tmp_path / "make.conf"
+        makeConf.write_text('EPREFIX="/prefix"\n')
+
+        assert elogpathFromMakeConf([makeConf], {}) == Path(
+            "/prefix/var/log/portage/elog"
+        )
+        assert elogpathFromMakeConf([makeConf], {"PORT_LOGDIR": "/logs"}) == Path(
+            "/logs/elog"
+        )
+        assert elogpathFromMakeConf([tmp_path / "missing"], {}) == Path(
+            "/var/log/portage/elog"
+        )
+
+
+class TestSnapshot:
+    def testRoundTrip(self, tmp_path: Path) -> None:
+        filename = tmp_path / "snapshot"
+        sources = {tmp_path: "host"}
+        elogPath = tmp_path / "cat:pkg-1.0:20200102-030405.log"
+        elogPath.write_text("WARN: postinst\n")
+        item = ElogModelItem(Elog.fromFilename(elogPath, source="host"))
+        item.setImportantState(IMPORTANT)
+
+        saveSnapshot(filename, [item], sources)
+        items = loadSnapshot(filename, sources)
+
+        assert items is not None
+        [loaded] = items
+        assert loaded.filename() == elogPath
+        assert loaded.eclass() is EClass.Warning
+        assert loaded.source() == "host"
+        assert loaded.digest() == item.digest() != ""
+        assert not loaded.isReadState()
+        assert loaded.isImportantState()
+        for column in Column:
+            assert loaded.displayText(column) == item.displayText(column)
+            assert loaded.sortKey(column) == item.sortKey(column)
+
+    def testOtherSourcesIgnoreSnapshot(self, tmp_path: Path) -> None:
+        filename = tmp_path / "snapshot"
+        saveSnapshot(filename, [], {tmp_path: ""})
+
+        assert loadSnapshot(filename, {tmp_path: ""}) == []
+        assert loadSnapshot(filename, {tmp_path / "other": ""}) is None
+        assert loadSnapshot(tmp_path / "missing", {tmp_path: ""}) is None
+
+
+class TestExport:
+    @pytest.fixture
+    def elogs(self, tmp_path: Path) -> Sequence[Elog]:
+        for day in range(1, 70):
+            (
+                tmp_path / f"cat:pkg{day}-1.0:202001{day % 28 + 1:02d}-030405.log"
+            ).write_text(f"WARN: postinst\nline <{day}>\n")
+        return loadElogs(sorted(tmp_path.iterdir()), {tmp_path: ""})
+
+    def testJsonLinesKeepOrder(self, elogs: Sequence[Elog]) -> None:
+        out = io.StringIO()
+        exportElogs(elogs, out, fmt="jsonl", workers=2)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["filename"] for r in records] == [str(e.filename) for e in elogs]
+        assert records[0]["eclass"] == "WARN"
+        assert records[0]["contents"] == elogs[0].read()
+
+    def testHtml(self, elogs: Sequence[Elog]) -> None:
+        out = io.StringIO()
+        exportElogs(elogs, out, fmt="html", workers=2)
+
+        document = out.getvalue()
+        assert document.startswith("<!DOCTYPE html>")
+        assert document.endswith("</html>\n")
+        assert document.count("<section>") == len(elogs)
+        assert "<h2>cat/pkg1-1.0</h2>" in document
+
+    def testSpawnedWorkersReadArchives(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        archive = tmp_path / "elogs.tar"
+        with tarfile.open(archive, "w") as tar:
+            for name, data in (
+                ("a:b-1.0:20200102-030405.log", b"WARN: postinst\n"),
+                ("c:d-1.0:20200102-030405.log.xz", b"corrupted"),
+            ):
+                info = tarfile.TarInfo(f"elog/{name}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        elogs = loadElogs(scanSources({archive: ""}), {archive: ""})
+        # The default on Linux from Python 3.14, the workers start empty.
+        monkeypatch.setattr(
+            export,
+            "ProcessPoolExecutor",
+            functools.partial(
+                ProcessPoolExecutor, mp_context=multiprocessing.get_context("spawn")
+            ),
+        )
+        out = io.StringIO()
+        exportElogs(elogs, out, fmt="jsonl", workers=1)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["contents"] for r in records] == ["WARN: postinst\n"]
+
+
+class TestIndexer:
+    @pytest.fixture
+    def index(self, tmp_path: Path) -> ElogIndex:
+        for name in ("a:b-1.0:20200102-030405.log", "c:d-1.0:20200102-030405.log"):
+            (tmp_path / name).write_text("WARN: postinst\n")
+        index = ElogIndex({tmp_path: ""})
+        index.refresh()
+        return index
+
+    def testQueryChanges(self, index: ElogIndex, tmp_path: Path) -> None:
+        full = index.query()
+        assert full.full
+        assert {elog.filename.name for elog in full.elogs} == {
+            "a:b-1.0:20200102-030405.log",
+            "c:d-1.0:20200102-030405.log",
+        }
+        assert not index.refresh()
+        assert index.query(full.generation).elogs == []
+
+        (tmp_path / "a:b-1.0:20200102-030405.log").unlink()
+        (tmp_path / "e:f-1.0:20200102-030405.log").write_text("ERROR: setup\n")
+        # The mtime may not move within the resolution of the clock.
+        os.utime(tmp_path, ns=(0, 0))
+        assert index.refresh()
+
+        delta = index.query(full.generation)
+        assert not delta.full
+        assert [elog.filename.name for elog in delta.elogs] == [
+            "e:f-1.0:20200102-030405.log"
+        ]
+        assert delta.elogs[0].eclass is EClass.Error
+        assert delta.removed == [tmp_path / "a:b-1.0:20200102-030405.log"]
+        assert index.query(0).full
+
+    def testSocket(self, index: ElogIndex, tmp_path: Path) -> None:
+        filename = tmp_path / "indexer.sock"
+        assert connectIndexer(filename, index.sources) is None
+        with IndexerServer(filename, index) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                indexer = connectIndexer(filename, index.sources)
+                assert indexer is not None
+                assert indexer.query() == index.query()
+                generation = index.query().generation
+                assert indexer.query(generation) == index.query(generation)
+                with pytest.raises(ValueError, match="other sources"):
+                    SocketIndexer(filename, {tmp_path / "other": ""}).query()
+                assert connectIndexer(filename, {tmp_path / "other": ""}) is None
+            finally:
+                server.shutdown()
+                thread.join()
+
+    def testSocketIsNotTakenOver(self, index: ElogIndex, tmp_path: Path) -> None:
+        filename = tmp_path / "indexer.sock"
+        # A stale socket left by an indexer that died.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(str(filename))
+        with IndexerServer(filename, index) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                with pytest.raises(OSError, match="already running"):
+                    IndexerServer(filename, index)
+                assert connectIndexer(filename, index.sources) is not None
+            finally:
+                server.shutdown()
+                thread.join()
+
+    def testSocketDirectoryIsPrivate(self, index: ElogIndex, tmp_path: Path) -> None:
+        filename = tmp_path / "shared" / "indexer.sock"
+        filename.parent.mkdir(mode=0o777)
+        filename.parent.chmod(0o777)
+
+        with pytest.raises(PermissionError, match="not private"):
+            IndexerServer(filename, index)
+        assert connectIndexer(filename, index.sources) is None
+
+
+class TestJournalStateStore:
+    @pytest.fixture
+    def filename(self, tmp_path: Path) -> Path:
+        return tmp_path / "state.journal"
+
+    def testRoundTrip(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveRead(frozenset({Path("/a"), Path("/b")}))
+        store.saveImportant(frozenset({Path("/b")}))
+        store.flush()
+
+        store = JournalStateStore(filename)
+        assert Path("/a") in store.loadRead()
+        assert Path("/b") in store.loadRead()
+        assert Path("/a") not in store.loadImportant()
+        assert Path("/b") in store.loadImportant()
+
+    def testSaveOnlyAppendsChanges(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveRead(frozenset({Path("/a"), Path("/b")}))
+        store.flush()
+        store.saveRead(frozenset({Path("/a"), Path("/c")}))
+        store.flush()
+
+        assert filename.read_text().splitlines()[2:] == [
+            f"+r\t{pathKey(Path('/c')):016x}\t{pathKey(Path('/')):016x}",
+            f"-r\t{pathKey(Path('/b')):016x}",
+        ]
+        readNames = JournalStateStore(filename).loadRead()
+        assert Path("/a") in readNames
+        assert Path("/b") not in readNames
+        assert Path("/c") in readNames
+
+    def testSetOnlyRecordsChanges(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.setRead({Path("/a"): True, Path("/b"): False})
+        store.setRead({Path("/a"): True})
+        store.flush()
+        store.setImportant({Path("/a"): True})
+        store.setRead({Path("/a"): False})
+        store.flush()
+
+        assert filename.read_text().splitlines() == [
+            f"+r\t{pathKey(Path('/a')):016x}\t{pathKey(Path('/')):016x}",
+            f"+i\t{pathKey(Path('/a')):016x}\t{pathKey(Path('/')):016x}",
+            f"-r\t{pathKey(Path('/a')):016x}",
+        ]
+
+    def testModelSavesOnlyChanges(self, filename: Path, tmp_path: Path) -> None:
+        for n in range(3):
+            (tmp_path / f"cat:pkg-{n}:20200101-00000{n}.log").write_text("")
+        store = JournalStateStore(filename)
+        model = Model()
+        model.populate(scanSources({tmp_path: ""}), settings=store)
+        model.setReadStates([1], Qt.CheckState.Checked)
+        model.save(store)
+        store.flush()
+
+        assert filename.read_text().splitlines() == [
+            f"+r\t{pathKey(model.item(1).filename()):016x}\t{pathKey(tmp_path):016x}"
+        ]
+        model.save(store)
+        assert not store.hasPendingChanges()
+
+        removed = model.item(1).filename()
+        model.removeFilenames([removed])
+        model.save(store)
+        store.flush()
+        assert removed not in JournalStateStore(filename).loadRead()
+
+    def testNothingWrittenBeforeFlush(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveRead(frozenset({Path("/a")}))
+
+        assert store.hasPendingChanges()
+        assert not filename.exists()
+
+    def testCompact(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        for name in ("/a", "/b", "/c"):
+            store.saveRead(frozenset({Path(name)}))
+            store.flush()
+
+        store.compact()
+
+        assert filename.read_text().splitlines() == [
+            f"+r\t{pathKey(Path('/c')):016x}\t{pathKey(Path('/')):016x}"
+        ]
+        assert Path("/c") in JournalStateStore(filename).loadRead()
+
+    def testPruneForgetsMissingElogs(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveRead(frozenset({Path("/a"), Path("/b")}))
+        store.saveImportant(frozenset({Path("/b")}))
+        store.flush()
+
+        store.prune([Path("/a")])
+        store.flush()
+
+        store = JournalStateStore(filename)
+        assert Path("/a") in store.loadRead()
+        assert Path("/b") not in store.loadRead()
+        assert Path("/b") not in store.loadImportant()
+
+    def testPruneKeepsOtherDirectories(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveRead(frozenset({Path("/elog/a"), Path("/elog/cat/b")}))
+        store.flush()
+
+        store = JournalStateStore(filename)
+        store.prune([Path("/other/c")])
+        store.prune([Path("/elog/d")])
+
+        assert Path("/elog/a") not in store.loadRead()
+        assert Path("/elog/cat/b") in store.loadRead()
+
+    def testPruneKeepsEntriesWithoutDirectory(self, filename: Path) -> None:
+        filename.write_text(f"+r\t{pathKey(Path('/elog/a')):016x}\n")
+
+        store = JournalStateStore(filename)
+        store.prune([Path("/elog/b")])
+
+        assert Path("/elog/a") in store.loadRead()
+
+    def testPruneKeepsStateWithoutElogs(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveRead(frozenset({Path("/a")}))
+
+        store.prune([])
+
+        assert Path("/a") in store.loadRead()
+
+    def testRenameMovesStates(self, filename: Path) -> None:
+        store = JournalStateStore(filename)
+        store.saveImportant(frozenset({Path("/a.log")}))
+        store.flush()
+
+        store.rename({Path("/a.log"): Path("/a.log.xz")})
+        store.flush()
+
+        store = JournalStateStore(filename)
+        assert Path("/a.log") not in store.loadImportant()
+        assert Path("/a.log.xz") in store.loadImportant()
+
+
+class TestCompressOld:
+    @pytest.fixture
+    def elogFile(self, tmp_path: Path) -> Path:
+        path = tmp_path / randomElogFileName()
+        path.write_text(randomElogContent(EClass.Warning, "postinst"))
+        return path
+
+    def testCompressesOldElogs(self, elogFile: Path) -> None:
+        content = elogFile.read_text()
+        old = time.time() - 40 * 24 * 60 * 60
+        os.utime(elogFile, (old, old))
+
+        renamed, errors = compressOld([elogFile], ".xz", olderThanDays=30)
+
+        target = elogFile.with_name(elogFile.name + ".xz")
+        assert not errors
+        assert renamed == {elogFile: target}
+        assert not elogFile.exists()
+        assert Elog.fromFilename(target).read() == content
+
+    def testSkipsRecentElogs(self, elogFile: Path) -> None:
+        renamed, errors = compressOld([elogFile], ".xz", olderThanDays=0)
+
+        assert not renamed
+        assert not errors
+        assert elogFile.exists()
+
+
+class TestThrottle:
+    def testRate(self, tmp_path: Path) -> None:
+        filenames = [tmp_path / randomElogFileName() for _ in range(3)]
+        for filename in filenames:
+            filename.write_bytes(b"x" * 100)
+        start = time.monotonic()
+
+        elogs = loadElogs(filenames, {tmp_path: ""}, throttle=Throttle(1000))
+
+        assert len(elogs) == 3
+        assert time.monotonic() - start >= 0.3
+
+    def testPause(self) -> None:
+        throttle = Throttle()
+        throttle.pauseFor(0.2)
+        start = time.monotonic()
+
+        throttle.consume(1 << 30)
+
+        assert time.monotonic() - start >= 0.2
+
+    def testLowerPriority(self) -> None:
+        priorities: list[int] = []
+
+        def run() -> None:
+            lowerPriority()
+            priorities.append(
+                os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+            )
+
+        before = os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        assert priorities == [19]
+        assert os.getpriority(os.PRIO_PROCESS, threading.get_native_id()) == before
+
+    def testLowerIoPriorityKeepsCpuPriority(self) -> None:
+        priorities: list[int] = []
+
+        def run() -> None:
+            lowerIoPriority()
+            priorities.append(
+                os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+            )
+
+        before = os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        assert priorities == [before]
+
+
+class TestTrayNotifier:
+    # The watcher needs the real filesystem.
+    def testWatchNewCategories(
+        self, tmp_path: Path, qtbot: QtBot, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        messages: list[tuple[object, ...]] = []
+
+        def showMessage(_self: QtWidgets.QSystemTrayIcon, *args: object) -> None:
+            messages.append(args)
+
+        monkeypatch.setattr(QtWidgets.QSystemTrayIcon, "showMessage", showMessage)
+        notifier = TrayNotifier(Config(sources={tmp_path: ""}))
+        notifier.start()
+
+        category = tmp_path / "new-category"
+        category.mkdir()
+        # Let the check of the new directory pass.
+        qtbot.wait(1000)
+        assert messages == []
+        (category / "pkg-1.0:29990101-000000.log").write_text(
+            randomElogContent(EClass.Error, "postinst")
+        )
+        qtbot.waitUntil(lambda: bool(messages))
+        assert len(messages) == 1
+
+
 class TestUI:
     @pytest.fixture(autouse=True)
     def elogsToFS(self, fs: _FakeFilesystem, elogPath: Path) -> None:
@@ -284,7 +1185,7 @@ class TestUI:
         qtbot: QtBot,
         qtmodeltester: QtModelTester,
     ) -> Iterator[Elogviewer]:
-        elogviewer = Elogviewer(Config(elogpath=elogPath))
+        elogviewer = Elogviewer(Config(sources={elogPath: ""}))
         elogviewer.controller.populate()
         qtbot.addWidget(elogviewer)
         yield elogviewer
@@ -302,6 +1203,434 @@ class TestUI:
                 Qt.MouseButton.LeftButton,
             )
 
+    def testLazyPopulateFetchesNewestFirst(self, elogPath: Path) -> None:
+        filenames = sorted(elogPath.glob("*.log"), key=Elog.dateKey, reverse=True)
+        model = Model()
+        model.populate(
+            filenames,
+            settings=JournalStateStore(elogPath.parent / "state.journal"),
+            pageSize=10,
+        )
+
+        assert model.rowCount() == 10
+        assert model.elogCount() == len(filenames)
+        assert model.unreadCount() == len(filenames)
+        while model.canFetchMore(QtCore.QModelIndex()):
+            model.fetchMore(QtCore.QModelIndex())
+        assert [model.item(row).filename() for row in range(model.rowCount())] == (
+            filenames
+        )
+
+    def testLazyPopulateSkipsBadNames(self, elogPath: Path) -> None:
+        filenames = list(elogPath.glob("*.log"))
+        badName = elogPath / "cat:pkg-1.0:nodate.log"
+        badName.write_text("")
+        model = Model()
+        model.populate(
+            [*filenames, badName],
+            settings=JournalStateStore(elogPath.parent / "state.journal"),
+            pageSize=10,
+        )
+        while model.canFetchMore(QtCore.QModelIndex()):
+            model.fetchMore(QtCore.QModelIndex())
+
+        assert sorted(item.filename() for item in model.items()) == sorted(filenames)
+
+    def testRemovePendingElogs(self, elogPath: Path) -> None:
+        filenames = sorted(elogPath.glob("*.log"), key=Elog.dateKey, reverse=True)
+        model = Model()
+        model.populate(
+            filenames,
+            settings=JournalStateStore(elogPath.parent / "state.journal"),
+            pageSize=10,
+        )
+        # The revalidation compares the elogs on disk with all of them.
+        assert sorted(model.filenames()) == sorted(filenames)
+
+        model.removeFilenames([filenames[0], filenames[-1]])
+        while model.canFetchMore(QtCore.QModelIndex()):
+            model.fetchMore(QtCore.QModelIndex())
+
+        assert [item.filename() for item in model.items()] == filenames[1:-1]
+
+    def testGroupedFollowsModel(
+        self,
+        elogviewer: Elogviewer,
+        qtbot: QtBot,
+        qtmodeltester: QtModelTester,
+    ) -> None:
+        qtbot.mouseClick(elogviewer.groupButton, Qt.MouseButton.LeftButton)
+        groupModel = elogviewer.groupModel
+        assert groupModel is not None
+        qtmodeltester.check(groupModel)
+
+        def unreadCount() -> int:
+            return sum(
+                group.unreadCount()
+                for row in range(groupModel.rowCount())
+                if (group := groupModel.groupFromIndex(groupModel.index(row, 0)))
+            )
+
+        assert elogviewer.treeView.isVisibleTo(elogviewer)
+        assert groupModel.rowCount() == len(
+            {
+                ElogGroup.key(elogviewer.model.item(row))
+                for row in range(elogviewer.model.rowCount())
+            }
+        )
+        assert unreadCount() == elogviewer.model.unreadCount()
+
+        # The actions apply to the tree, not to the hidden table.
+        treeModel = elogviewer.treeView.model()
+        assert treeModel is not None
+        child = treeModel.index(0, 0, treeModel.index(0, 0))
+        item = groupModel.itemFromIndex(sourceIndex(child))
+        assert item is not None
+        proxyModel = elogviewer.proxyModel
+        tableItems = [
+            elogviewer.model.item(sourceIndex(proxyModel.index(row, 0)).row())
+            for row in range(proxyModel.rowCount())
+        ]
+        other = next(row for row, i in enumerate(tableItems) if i is not item)
+        elogviewer.tableView.selectRow(other)
+        elogviewer.treeView.setCurrentIndex(child)
+        count = elogviewer.model.rowCount()
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        assert elogviewer.model.rowCount() == count - 1
+        assert not item.filename().exists()
+        assert tableItems[other].filename().exists()
+
+        qtbot.keyClick(
+            elogviewer.treeView,
+            Qt.Key.Key_A,
+            Qt.KeyboardModifier.ControlModifier,
+        )
+        qtbot.mouseClick(elogviewer.markReadButton, Qt.MouseButton.LeftButton)
+        assert unreadCount() == 0
+
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        assert groupModel.rowCount() == 0
+
+        qtbot.mouseClick(elogviewer.groupButton, Qt.MouseButton.LeftButton)
+        assert elogviewer.tableView.isVisibleTo(elogviewer)
+
+    def testStartFromSnapshot(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        model = elogviewer.model
+        model.setReadStates([0], Qt.CheckState.Checked)
+        readName = model.item(0).filename()
+        removedName = model.item(1).filename()
+        count = model.elogCount()
+        elogviewer.controller.flushSettings()
+        elogviewer.controller.saveSnapshot()
+        removedName.unlink()
+        addedName = elogPath / randomElogFileName()
+        addedName.write_text(randomElogContent(EClass.Error, "postinst"))
+
+        restored = Elogviewer(Config(sources={elogPath: ""}))
+        qtbot.addWidget(restored)
+        with qtbot.waitSignal(restored.controller.revalidated):
+            restored.start()
+            assert restored.model.elogCount() == count
+
+        names = {item.filename() for item in restored.model.items()}
+        assert restored.model.elogCount() == count
+        assert removedName not in names
+        assert addedName in names
+        assert restored.model.readCount() == 1
+        assert next(
+            item for item in restored.model.items() if item.filename() == readName
+        ).isReadState()
+
+    def testLargeTableStopsFittingRows(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        header = elogviewer.tableView.horizontalHeader()
+        assert header is not None
+        assert not elogviewer.isLargeTable()
+        assert header.sectionResizeMode(Column.Package) is (
+            header.ResizeMode.ResizeToContents
+        )
+
+        settings = QtCore.QSettings("elogviewer", "elogviewer")
+        settings.setValue("largeTableRows", elogviewer.model.elogCount() - 1)
+        try:
+            large = Elogviewer(Config(sources={elogPath: ""}))
+            qtbot.addWidget(large)
+            large.controller.populate()
+            header = large.tableView.horizontalHeader()
+            assert header is not None
+            assert large.isLargeTable()
+            assert header.sectionResizeMode(Column.Package) is (
+                header.ResizeMode.Interactive
+            )
+            header.resizeSection(Column.Package, 123)
+            large.close()
+            assert settings.value("columnWidths", type=list)[Column.Package] == 123
+        finally:
+            settings.remove("largeTableRows")
+            settings.remove("columnWidths")
+
+    def testStartWithIndexer(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        index = ElogIndex({elogPath: ""})
+        index.refresh()
+        indexed = Elogviewer(Config(sources={elogPath: ""}), indexer=index)
+        qtbot.addWidget(indexed)
+        with qtbot.waitSignal(indexed.controller.revalidated):
+            indexed.start()
+        assert indexed.model.elogCount() == elogviewer.model.elogCount()
+
+        addedName = elogPath / randomElogFileName()
+        addedName.write_text(randomElogContent(EClass.Error, "postinst"))
+        os.utime(elogPath, ns=(0, 0))
+        index.refresh()
+        with qtbot.waitSignal(indexed.controller.revalidated):
+            indexed.controller.revalidate()
+        assert addedName in {item.filename() for item in indexed.model.items()}
+        assert indexed.model.elogCount() == elogviewer.model.elogCount() + 1
+
+    def testFailingIndexerIsNotPolled(
+        self,
+        elogviewer: Elogviewer,
+        qtbot: QtBot,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        queries: list[int | None] = []
+
+        class FailingIndexer:
+            def query(self, since: int | None = None) -> IndexDelta:
+                queries.append(since)
+                raise ValueError("the indexer serves other sources")
+
+        monkeypatch.setattr("elogviewer.uicontroller._INDEXER_POLL_MS", 10)
+        indexed = Elogviewer(elogviewer.controller.config, indexer=FailingIndexer())
+        qtbot.addWidget(indexed)
+        with qtbot.waitSignal(indexed.controller.revalidated):
+            indexed.start()
+        qtbot.wait(100)
+
+        # Scanned once instead.
+        assert queries == [None]
+        assert indexed.model.elogCount() == elogviewer.model.elogCount()
+
+    def testTrayNotifiesNewErrors(self, elogPath: Path, qtbot: QtBot) -> None:
+        notifier = TrayNotifier(Config(sources={elogPath: ""}))
+        notifier.start()
+        assert notifier.check() == []
+
+        errorName = elogPath / "cat:pkg-1.0:29990101-000000.log"
+        errorName.write_text(randomElogContent(EClass.Error, "postinst"))
+        (elogPath / "cat:pkg-1.0:29990101-000001.log").write_text(
+            randomElogContent(EClass.Info, "postinst")
+        )
+        [elog] = notifier.check()
+        assert elog.filename == errorName
+        assert notifier.check() == []
+
+        errorName.rename(errorName.with_name(f"{errorName.name}.xz"))
+        assert notifier.check() == []
+
+        assert notifier.window() is None
+        notifier.showWindow()
+        window = notifier.window()
+        assert window is not None
+        qtbot.addWidget(window)
+        assert window.isVisible()
+
+    def testGroupedInsertsNewPackages(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        qtbot.mouseClick(elogviewer.groupButton, Qt.MouseButton.LeftButton)
+        groupModel = elogviewer.groupModel
+        assert groupModel is not None
+        count = groupModel.rowCount()
+        # A copy repaints the duplicates of the elogs already grouped.
+        original = elogviewer.model.item(0)
+        copy = elogPath / "new:pkg-1.0:20000101-000000.log"
+        copy.write_text(original.filename().read_text())
+        with qtbot.waitSignal(elogviewer.controller.revalidated):
+            elogviewer.controller.revalidate()
+
+        assert groupModel.rowCount() == count + 1
+        assert {
+            (group.category, group.name)
+            for row in range(groupModel.rowCount())
+            if (group := groupModel.groupFromIndex(groupModel.index(row, 0)))
+        } >= {("new", "pkg")}
+        assert elogviewer.model.duplicateCount(original) == 2
+
+        qtbot.mouseClick(elogviewer.groupButton, Qt.MouseButton.LeftButton)
+
+    def testCollapseDuplicates(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        contents = randomElogContent(EClass.Warning, "postinst")
+        older = elogPath / "cat:pkg-1.0:20000101-000000.log"
+        newer = elogPath / "cat:pkg-1.1:20000102-000000.log"
+        older.write_text(contents)
+        newer.write_text(contents)
+        elogviewer.controller.populate()
+        model = elogviewer.model
+        rows = {model.item(row).filename(): row for row in range(model.rowCount())}
+        for filename in (older, newer):
+            index = model.index(rows[filename], Column.Duplicates)
+            assert index.data() == "2"
+        count = elogviewer.proxyModel.rowCount()
+
+        qtbot.mouseClick(elogviewer.collapseButton, Qt.MouseButton.LeftButton)
+        assert elogviewer.proxyModel.rowCount() == count - 1
+        assert model.isRepeat(model.item(rows[older]))
+        assert not model.isRepeat(model.item(rows[newer]))
+
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            elogviewer.tableView.selectRow(
+                elogviewer.proxyModel.mapFromSource(model.index(rows[newer], 0)).row()
+            )
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        # The older copy shows up again, on its own.
+        assert elogviewer.proxyModel.rowCount() == count - 1
+        [row] = [
+            r for r in range(model.rowCount()) if model.item(r).filename() == older
+        ]
+        assert model.index(row, Column.Duplicates).data() == ""
+
+        qtbot.mouseClick(elogviewer.collapseButton, Qt.MouseButton.LeftButton)
+        assert elogviewer.proxyModel.rowCount() == model.rowCount()
+
+    def testPrune(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        filenames = [
+            elogPath / f"cat:pkg-1.{n}:2000010{n}-000000.log" for n in range(1, 4)
+        ]
+        for filename in filenames:
+            filename.write_text(randomElogContent(EClass.Info, "postinst"))
+        elogviewer.controller.populate()
+        count = elogviewer.model.rowCount()
+        questions: list[str] = []
+
+        def question(_parent: object, _title: str, text: str) -> object:
+            questions.append(text)
+            return QtWidgets.QMessageBox.StandardButton.Yes
+
+        monkeypatch.setattr(QtWidgets.QMessageBox, "question", question)
+        settings = QtCore.QSettings("elogviewer", "elogviewer")
+        settings.setValue("retainPerPackage", 1)
+        settings.setValue("retainDays", 0)
+        try:
+            with qtbot.waitSignal(elogviewer.controller.pruneFinished):
+                qtbot.mouseClick(elogviewer.pruneButton, Qt.MouseButton.LeftButton)
+        finally:
+            settings.remove("retainPerPackage")
+            settings.remove("retainDays")
+
+        assert questions[0].startswith("Delete 2 elogs")
+        assert [filename.exists() for filename in filenames] == [False, False, True]
+        assert elogviewer.model.rowCount() == count - 2
+
+    def testCompressWithUnusableFormat(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        filename = elogPath / "cat:pkg-1.0:20000101-000000.log"
+        filename.write_text(randomElogContent(EClass.Info, "postinst"))
+        old = time.time() - 40 * 24 * 60 * 60
+        os.utime(filename, (old, old))
+        elogviewer.controller.populate()
+
+        settings = QtCore.QSettings("elogviewer", "elogviewer")
+        settings.setValue("compressFormat", ".rar")
+        try:
+            with qtbot.waitSignal(elogviewer.controller.compressFinished):
+                elogviewer.compressAction.trigger()
+        finally:
+            settings.remove("compressFormat")
+
+        assert not filename.exists()
+        assert filename.with_name(filename.name + ".xz").exists()
+
+    def testLastRun(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        for date in ("21000101-000000", "21000101-003000"):
+            (elogPath / f"cat:pkg-1.0:{date}.log").write_text(
+                randomElogContent(EClass.Info, "postinst")
+            )
+        elogviewer.controller.populate()
+        count = elogviewer.proxyModel.rowCount()
+
+        qtbot.mouseClick(elogviewer.lastRunButton, Qt.MouseButton.LeftButton)
+        assert elogviewer.proxyModel.rowCount() == 2
+
+        # A later emerge run replaces the last one.
+        (elogPath / "cat:pkg-1.1:21000102-000000.log").write_text(
+            randomElogContent(EClass.Info, "postinst")
+        )
+        elogviewer.controller.populate()
+        assert elogviewer.proxyModel.rowCount() == 1
+
+        qtbot.mouseClick(elogviewer.lastRunButton, Qt.MouseButton.LeftButton)
+        assert elogviewer.proxyModel.rowCount() == count + 1
+
+    def testDiffWithPrevious(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        older = elogPath / "cat:pkg-1.0:20000101-000000.log"
+        newer = elogPath / "cat:pkg-1.1:20000102-000000.log"
+        older.write_text("WARN: postinst\nkept\nremoved\n")
+        newer.write_text("WARN: postinst\nkept\nadded\n")
+        elogviewer.controller.populate()
+        model = elogviewer.model
+        [row] = [
+            r for r in range(model.rowCount()) if model.item(r).filename() == newer
+        ]
+        elogviewer.tableView.selectRow(
+            elogviewer.proxyModel.mapFromSource(model.index(row, 0)).row()
+        )
+
+        with qtbot.waitSignal(elogviewer.controller.diffReady):
+            qtbot.mouseClick(elogviewer.diffButton, Qt.MouseButton.LeftButton)
+        text = elogviewer.textEdit.toPlainText()
+        assert "+ added" in text
+        assert "- removed" in text
+        assert "kept" in text
+        assert "postinst" not in text
+
+        qtbot.mouseClick(elogviewer.diffButton, Qt.MouseButton.LeftButton)
+        assert "postinst" in elogviewer.textEdit.toPlainText()
+
     def testHasElogs(self, elogviewer: Elogviewer, elogPath: Path) -> None:
         assert elogviewer.model.elogCount() == _count(elogPath.glob("*.log")) > 0
 
@@ -324,6 +1653,20 @@ class TestUI:
         qtbot.mouseClick(elogviewer.markReadButton, Qt.MouseButton.LeftButton)
         assert elogviewer.model.readCount() == elogviewer.model.elogCount()
 
+    def testAllReadSavesOnce(self, elogviewer: Elogviewer, qtbot: QtBot) -> None:
+        saved: list[None] = []
+        elogviewer.model.statesChanged.connect(lambda: saved.append(None))
+
+        qtbot.keyClick(
+            elogviewer.tableView,
+            Qt.Key.Key_A,
+            Qt.KeyboardModifier.ControlModifier,
+        )
+        qtbot.mouseClick(elogviewer.markReadButton, Qt.MouseButton.LeftButton)
+
+        assert elogviewer.model.readCount() == elogviewer.model.elogCount()
+        assert len(saved) == 1
+
     def testAllUnread(self, elogviewer: Elogviewer, qtbot: QtBot) -> None:
         qtbot.keyClick(elogviewer.tableView, Qt.Key.Key_Up)
         qtbot.keyClick(
@@ -375,7 +1718,8 @@ class TestUI:
             Qt.Key.Key_A,
             Qt.KeyboardModifier.ControlModifier,
         )
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
 
         qtbot.mouseClick(elogviewer.refreshButton, Qt.MouseButton.LeftButton)
 
@@ -391,7 +1735,8 @@ class TestUI:
         qtbot.keyClick(elogviewer.tableView, Qt.Key.Key_Up)
         count = elogviewer.model.elogCount()
 
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
 
         assert elogviewer.model.elogCount() == count - 1
         assert elogviewer.model.elogCount() == _count(elogPath.glob("*.log"))
@@ -405,12 +1750,37 @@ class TestUI:
         qtbot.keyClick(elogviewer.tableView, Qt.Key.Key_Up)
         count = elogviewer.model.elogCount()
 
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
 
         assert elogviewer.model.elogCount() == count - 2
         assert elogviewer.model.elogCount() == _count(elogPath.glob("*.log"))
 
+    def testDeleteScattered(
+        self,
+        elogviewer: Elogviewer,
+        elogPath: Path,
+        qtbot: QtBot,
+    ) -> None:
+        count = elogviewer.model.elogCount()
+        selectionModel = elogviewer.tableView.selectionModel()
+        assert selectionModel is not None
+        selectionModel.clearSelection()
+        for row in (0, 2, 3, 7):
+            selectionModel.select(
+                elogviewer.proxyModel.index(row, 0),
+                QtCore.QItemSelectionModel.SelectionFlag.Select
+                | QtCore.QItemSelectionModel.SelectionFlag.Rows,
+            )
+
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+
+        assert elogviewer.model.elogCount() == count - 4
+        assert elogviewer.model.elogCount() == _count(elogPath.glob("*.log"))
+
     def testDeleteAll(
         self,
         elogviewer: Elogviewer,
@@ -422,7 +1792,8 @@ class TestUI:
             Qt.Key.Key_A,
             Qt.KeyboardModifier.ControlModifier,
         )
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
 
         assert elogviewer.model.elogCount() == _count(elogPath.glob("*.log")) == 0
 
@@ -437,14 +1808,16 @@ class TestUI:
             Qt.Key.Key_A,
             Qt.KeyboardModifier.ControlModifier,
         )
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
         assert _count(elogPath.glob("*.log")) == 0
 
-        qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
+        with qtbot.waitSignal(elogviewer.controller.deleteFinished):
+            qtbot.mouseClick(elogviewer.deleteButton, Qt.MouseButton.LeftButton)
 
         assert elogviewer.model.elogCount() == _count(elogPath.glob("*.log"))
 
-    def testReadFontStyleDelegatePaintRespectsSortOrder(
+    def testUnreadFontRespectsSortOrder(
         self,
         elogviewer: Elogviewer,
     ) -> None:
@@ -452,18 +1825,24 @@ class TestUI:
         elogviewer.model.setReadState(
             elogviewer.model.index(0, Column.ReadState), Qt.CheckState.Checked
         )
-        delegate = elogviewer.tableView.itemDelegate()
-        assert delegate is not None
-        pixmap = QtGui.QPixmap(100, 20)
         for row in range(elogviewer.proxyModel.rowCount()):
             proxyIdx = elogviewer.proxyModel.index(row, Column.Package)
             sourceIdx = elogviewer.proxyModel.mapToSource(proxyIdx)
-            option = QtWidgets.QStyleOptionViewItem()
-            painter = QtGui.QPainter(pixmap)
-            delegate.paint(painter, option, proxyIdx)
-            painter.end()
-            assert option.font.bold() == (
-                not elogviewer.model.item(sourceIdx.row()).isReadState()
+            font = proxyIdx.data(Qt.ItemDataRole.FontRole)
+            if elogviewer.model.item(sourceIdx.row()).isReadState():
+                assert font is None
+            else:
+                assert font.bold()
+
+    def testEclassForeground(self, elogviewer: Elogviewer) -> None:
+        for row in range(elogviewer.model.rowCount()):
+            index = elogviewer.model.index(row, Column.Eclass)
+            brush = index.data(Qt.ItemDataRole.ForegroundRole)
+            color = eclassColor(elogviewer.model.item(row).eclass())
+            assert brush.color() == QtGui.QColor(*color)
+            assert (
+                index.siblingAtColumn(Column.Date).data(Qt.ItemDataRole.ForegroundRole)
+                is None
             )
 
     def testButtonDelegatePaintReflectsCheckState(